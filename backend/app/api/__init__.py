@@ -1,2 +1,3 @@
 from .auth import router as auth_router
+from .metrics import router as metrics_router
 from .style_filter import router as style_filer_router
@@ -40,7 +40,7 @@ async def email_signup(
 
     user = User.from_schema(body, f"{req.base_url}static/images/default-profile.jpg")
     user, token = await crud.user.create(db, user)
-    log.info(f"Created account for email ({user.email}) with ID {user.id}")
+    log.info("Created account for email (%s) with ID %s", user.email, user.id)
 
     background_tasks.add_task(
         utils.email.send_magic_link,
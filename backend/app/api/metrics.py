@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends, status
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import deps, schemas, utils
+from app.core import responses
+from app.core.logger import log_queue_handler
+from app.crud.style_filter import feed_pages, feed_totals
+from app.crud.user import user_principals
+from app.db.base import engine, replicas
+from app.db.pool import TimedQueuePool
+from app.workers import storage_deletion_worker
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="Get runtime metrics of this worker process",
+    responses=responses.metrics,
+    response_model=responses.metrics[status.HTTP_200_OK]["model"],
+    dependencies=[Depends(deps.metrics_auth)],
+)
+async def get_metrics() -> schemas.http.MetricsOut:
+    return schemas.http.MetricsOut(
+        uploads=utils.upload_engine.metrics(),
+        caches={
+            "feed_pages": feed_pages.metrics(),
+            "feed_totals": feed_totals.metrics(),
+            "user_principals": user_principals.metrics(),
+        },
+        logs=schemas.LoggerMetrics(
+            queued=log_queue_handler.queue.qsize(),
+            dropped=log_queue_handler.dropped,
+        ),
+        db=get_pool_metrics(engine),
+        replicas={
+            replica.name: get_pool_metrics(replica.engine)
+            for replica in replicas.replicas
+        },
+        storageDeletions=storage_deletion_worker.metrics(),
+    )
+
+
+def get_pool_metrics(db_engine: AsyncEngine) -> schemas.DbPoolMetrics:
+    pool = db_engine.pool
+    assert isinstance(pool, TimedQueuePool)
+
+    return pool.get_metrics()
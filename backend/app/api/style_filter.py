@@ -1,21 +1,24 @@
 from typing import Annotated
 from uuid import UUID
 
-import filetype
-from fastapi import APIRouter, File, Query, UploadFile, status
+from fastapi import APIRouter, Query, Response, status
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, deps, schemas
-from app.core import log, responses
+from app.core import log, responses, settings
 from app.core.exceptions import (
     BadRequestError,
-    EntityTooLargeError,
+    ConflictError,
     ForbiddenError,
     InternalServerError,
     NotFoundError,
-    UnsupportedMediaTypeError,
 )
-from app.utils import FilterUploadResult, filter_storage
+from app.core.responses import JsonResponse, render_json
+from app.crud.style_filter import FEED_TAG, feed_pages, filter_tag
+from app.db.base import AsyncDbSession
+from app.utils import filter_storage
+from app.utils.filter_storage import FilterUploadResult
 
 router = APIRouter()
 
@@ -28,65 +31,85 @@ MAX_REPORT_COUNT = 25
     responses=responses.upload_style_filters,
     response_model=responses.upload_style_filters[status.HTTP_201_CREATED]["model"],
     status_code=status.HTTP_201_CREATED,
+    openapi_extra=deps.filter_uploads_openapi,
 )
 async def upload_filters(
-    db: deps.db_dep,
     user: deps.current_user_dep,
-    files: list[UploadFile] = File(..., description="Filters to upload", media_type=""),
+    files: deps.filter_uploads_dep,
 ) -> schemas.http.UploadStyleFiltersOut:
-    log.info(f"Files {len(files)}: {files}")
-
-    for file in files:
-        file_info = filetype.guess(file.file)
-        if file_info is None:
-            raise UnsupportedMediaTypeError(
-                message=f"File '{file.filename}' is not a valid image",
-                reason="Invalid file type",
-            )
-
-        detected_content_type = file_info.extension.lower()
-
-        if (
-            file.content_type not in filter_storage.SUPPORTED_FILE_TYPE
-            or detected_content_type not in filter_storage.SUPPORTED_FILE_TYPE
-        ):
-            raise UnsupportedMediaTypeError(
-                message=f"File '{file.filename}' is not a valid image",
-                reason="Invalid file type",
-            )
+    # Files are already validated (type and size) while the body was received
+    log.info("Files %s: %s", len(files), files)
 
-        if file.size and file.size > filter_storage.MAX_FILE_SIZE:
-            max_file_size_in_mb = filter_storage.to_mb(filter_storage.MAX_FILE_SIZE)
-            input_file_size_in_mb = filter_storage.to_mb(file.size)
+    # No DB connection is held while the images are uploaded to the storage (which
+    # can take seconds), the DB is used in short sessions before and after it
 
-            raise EntityTooLargeError(
-                message=(
-                    f"File size must be less than {max_file_size_in_mb} MB "
-                    f"{file.filename} is {input_file_size_in_mb} MB large"
-                ),
-                reason="Upload file size exceeded",
-            )
+    # Images which are already stored (same content) are reused instead of being
+    # uploaded again, and so are the duplicates within this request
+    async with AsyncDbSession() as db:
+        stored = await crud.style_filter.get_uploads_by_content_hash(
+            db, {file.content_hash for file in files}
+        )
 
-    results: list[FilterUploadResult] = []
+    new_files = list(
+        {
+            file.content_hash: file for file in files if file.content_hash not in stored
+        }.values()
+    )
+    log.info("Reusing %s stored images", len(files) - len(new_files))
 
-    for file in files:
-        result = filter_storage.upload(file)
-        if result:
-            results.append(result)
+    results = await filter_storage.upload_many(new_files)
 
     try:
-        assert len(results) == len(files), "Failed to upload all of the images"
+        assert len(results) == len(new_files), "Failed to upload all of the images"
+
+        reused_img_ids = {img.img_id for img in stored.values()}
+        stored.update({result.content_hash: result for result in results})
+
+        async with AsyncDbSession() as db:
+            # Style filters using the reused images might have been deleted while
+            # uploading, and the images queued for deletion. The ones still in use
+            # are locked until the new style filters are committed, and images
+            # queued for deletion (which might already be gone) aren't used
+            in_use = await crud.style_filter.lock_img_ids(db, reused_img_ids)
+            queued = await crud.storage_deletion.get_queued_img_ids(
+                db, {img.img_id for img in stored.values()}
+            )
+            if in_use != reused_img_ids or len(queued) > 0:
+                raise ConflictError("Images are being deleted, try again")
+
+            filters = await crud.style_filter.create_many(
+                db, [stored[file.content_hash] for file in files], user
+            )
 
-        filters = await crud.style_filter.create_many(db, results, user.id)
         return schemas.http.UploadStyleFiltersOut(
             filters=[filter.to_schema() for filter in filters]
         )
+    except ConflictError:
+        await discard_uploads(results)
+        raise
     except (SQLAlchemyError, AssertionError) as e:
-        log.error(f"Failed to upload images: {e}. Deleting uploaded images")
+        log.error("Failed to upload images: %s. Deleting uploaded images", e)
+        await discard_uploads(results)
+        raise InternalServerError()
 
-        filter_storage.delete(img_ids={img.img_id for img in results})
 
-        raise InternalServerError()
+async def discard_uploads(results: list[FilterUploadResult]) -> None:
+    """
+    Queue the images uploaded by a failed request for deletion (reused ones are
+    still in use). The same content is stored once by the local storage, hence the
+    image might be used by a concurrent upload. The storage deletion worker only
+    deletes the images which aren't used by any style filter.
+    """
+
+    try:
+        async with AsyncDbSession() as db:
+            await crud.storage_deletion.create_many(
+                db, {result.img_id for result in results}
+            )
+            await db.commit()
+    except SQLAlchemyError as e:
+        # Left for the storage reconciliation, which deletes orphaned images
+        log.error("Failed to queue %s uploaded images: %s", len(results), e)
 
 
 @router.delete(
@@ -109,10 +132,7 @@ async def delete_filters(
     if not is_owner:
         raise ForbiddenError()
 
-    filter_storage.delete(
-        {filter.img_id for filter in filters if filter.img_id is not None}
-    )
-
+    # Images are deleted from the storage later on by the storage deletion worker
     await crud.style_filter.delete_many(db, [filter.id for filter in filters])
 
 
@@ -129,44 +149,32 @@ async def report_style_filter(
     user: deps.current_user_dep,
     query: Annotated[schemas.ReportStyleFilterQuery, Query()],
 ) -> schemas.http.ReportStyleFilterOut:
-    style_filter = await crud.style_filter.get_by_id(db, filter_id)
+    is_increment = query.type == "increment"
 
-    if style_filter is None:
-        raise NotFoundError()
+    # The report is recorded (or withdrawn) and the count is changed in the same
+    # transaction. The primary key of the reports prevents reporting twice and the
+    # count is updated in place, hence concurrent reports aren't lost
+    if is_increment:
+        reported_filter_id = await crud.filter_report.create(db, user.id, filter_id)
+    else:
+        reported_filter_id = await crud.filter_report.delete(db, user.id, filter_id)
 
-    is_increment = query.type == "increment"
-    has_reported = style_filter.id in user.reported_filter_ids
+    if reported_filter_id is None:
+        await db.rollback()
 
-    if is_increment and has_reported:
-        raise BadRequestError("Already reported")
-    if not is_increment and not has_reported:
+        if await crud.style_filter.get_report_count(db, filter_id) is None:
+            raise NotFoundError()
+        if is_increment:
+            raise BadRequestError("Already reported")
         raise BadRequestError("Not reported style filter")
 
-    is_banned = style_filter.report_count > MAX_REPORT_COUNT
-
-    await crud.style_filter.change_report_count(
+    is_banned = await crud.style_filter.change_report_count(
         db,
-        filter_id,
+        reported_filter_id,
         is_increment=is_increment,
-        is_banned=is_banned,
-        commit=False,
-    )
-
-    new_reported_filter_ids = user.reported_filter_ids.copy()
-    if is_increment:
-        new_reported_filter_ids.append(style_filter.id)
-    else:
-        new_reported_filter_ids.remove(style_filter.id)
-
-    await crud.user.update_banned_post_ids(
-        db,
-        user_id=user.id,
-        reported_filter_ids=new_reported_filter_ids,
-        commit=False,
+        max_report_count=MAX_REPORT_COUNT,
     )
 
-    await db.commit()
-
     return schemas.http.ReportStyleFilterOut(is_banned=is_banned)
 
 
@@ -178,17 +186,68 @@ async def report_style_filter(
     response_model=responses.get_style_filters[status.HTTP_200_OK]["model"],
 )
 async def get_style_filters(
-    db: deps.db_dep,
+    db: deps.read_db_dep,
     query: Annotated[schemas.GetStyleFiltersQuery, Query()],
-) -> schemas.http.GetStyleFiltersOut:
-    filters, total = await crud.style_filter.get_many(
+) -> Response:
+    # First pages of the main feed are served from the cache, which is invalidated
+    # by the changes to what they show
+    if (
+        feed_pages.enabled
+        and query.author_id is None
+        and query.cursor is None
+        and query.offset < settings.feed_cache_max_offset
+    ):
+
+        async def render_page() -> tuple[bytes, list[str]]:
+            # Shared by the concurrent requests for the page and run in a task of
+            # its own, hence in a session of its own too (the request's one is
+            # closed once the request ends, possibly before the page is rendered).
+            # Read from the primary: the tags are bumped once the changes are
+            # committed there, a lagging replica could return a page older than its
+            # tags, which would be cached as current
+            async with AsyncDbSession() as page_db:
+                page, filter_ids = await get_feed_page(page_db, query)
+
+            tags = [FEED_TAG, *(filter_tag(filter_id) for filter_id in filter_ids)]
+            return render_json(page), tags
+
+        body = await feed_pages.get_or_set(
+            f"{query.limit}:{query.offset}:{query.include_total:d}",
+            render_page,
+        )
+        return Response(body, media_type=JsonResponse.media_type)
+
+    page, _filter_ids = await get_feed_page(db, query)
+    return Response(render_json(page), media_type=JsonResponse.media_type)
+
+
+async def get_feed_page(
+    db: AsyncSession,
+    query: schemas.GetStyleFiltersQuery,
+) -> tuple[schemas.http.GetStyleFiltersOut, list[int]]:
+    """Page of the feed, and the IDs of the filters on it"""
+
+    rows = await crud.style_filter.get_many(
         db,
         author_id=query.author_id,
         limit=query.limit,
         offset=query.offset,
+        cursor=query.decoded_cursor,
     )
 
-    return schemas.http.GetStyleFiltersOut(
-        filters=[filter.to_schema() for filter in filters],
+    total = None
+    if query.include_total:
+        total = await crud.style_filter.count(db, author_id=query.author_id)
+
+    # A full page means that there might be more filters after it
+    next_cursor = None
+    if query.limit > 0 and len(rows) == query.limit:
+        last = rows[-1]
+        next_cursor = schemas.StyleFilterCursor(created_at=last.created_at, id=last.id)
+
+    page = schemas.http.GetStyleFiltersOut(
+        filters=[row.filter for row in rows],
         total=total,
+        nextCursor=next_cursor.encode() if next_cursor else None,
     )
+    return page, [row.id for row in rows]
@@ -30,7 +30,7 @@ async def init() -> None:
         await db.execute(text("SELECT 1"))
         return
     except Exception as e:
-        log.critical(f"Failed to connect to the database: {e}")
+        log.critical("Failed to connect to the database: %s", e)
         raise e
     finally:
         await db.close()
@@ -1,19 +1,203 @@
+import atexit
+import json
 import logging
+import queue
+import random
 import sys
-from logging.handlers import RotatingFileHandler
+from collections.abc import Mapping
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http import HTTPStatus
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from asgi_correlation_id import CorrelationIdFilter
 
 from app.core import settings
+from app.core.settings import LoggerDropPolicy
 
+# Log record arguments which are safe to format later on, on the listener's thread
+IMMUTABLE_ARG_TYPES = (str, int, float, bool, bytes, type(None))
 
-def create_app_logger() -> logging.Logger:
+# Processing time (seconds) of the current request, set by the response headers
+# middleware right before the response starts (i.e. before the access log line)
+request_duration: ContextVar[float | None] = ContextVar(
+    "request_duration",
+    default=None,
+)
+
+
+@dataclass
+class PoolCheckouts:
+    """Connections checked out of the DB pool by a request"""
+
+    count: int = 0
+
+    # Seconds, including the wait for a free connection and the pre-ping
+    duration: float = 0
+
+
+# DB pool checkouts of the current request. Set by the response headers middleware
+# when the request starts, and updated by the DB pool on every checkout
+pool_checkouts: ContextVar[PoolCheckouts | None] = ContextVar(
+    "pool_checkouts",
+    default=None,
+)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hands log records over to a bounded queue, which is drained by a background
+    thread (`QueueListener`) that does the actual formatting and (file) I/O.
+
+    When the queue is full, the drop policy decides what happens: `drop_new`
+    drops the new record, `drop_old` drops the oldest queued record and `block`
+    waits for room (which blocks the event loop).
+    """
+
+    def __init__(
+        self,
+        record_queue: "queue.Queue[logging.LogRecord]",
+        drop_policy: LoggerDropPolicy,
+    ) -> None:
+        super().__init__(record_queue)
+        self.queue: queue.Queue[logging.LogRecord]
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike the default, the record isn't formatted here (on the caller's
+        # thread) but by the listener's handlers. Records are passed between threads
+        # of the same process, so they don't need to be pickleable. Arguments that
+        # could be changed in the meantime (e.g. a list) are rendered into the
+        # message right away though, as the default does
+        if record.args and not _are_immutable(record.args):
+            record.msg = record.getMessage()
+            record.args = None
+
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.drop_policy == "block":
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+            if self.drop_policy == "drop_old":
+                try:
+                    self.queue.get_nowait()
+                    self.queue.put_nowait(record)
+                except (queue.Empty, queue.Full):
+                    pass
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats log records as compact, single line JSON objects. Uvicorn access log
+    lines are split into their fields (client, method, path, status, etc.).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, object] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "requestId": getattr(record, "correlation_id", None),
+        }
+
+        if record.name == "uvicorn.access" and isinstance(record.args, tuple):
+            client, method, path, http_version, status = record.args
+            entry.update(
+                client=client,
+                method=method,
+                path=path,
+                httpVersion=http_version,
+                status=status,
+                durationMs=_duration_ms(record),
+                dbCheckouts=getattr(record, "db_checkouts", None),
+                dbCheckoutMs=_db_checkout_ms(record),
+            )
+        else:
+            entry["msg"] = record.getMessage()
+
+            # Source location only for warnings and errors, as it's not free
+            if record.levelno >= logging.WARNING:
+                entry["src"] = f"{record.filename}:{record.lineno}"
+
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class AccessLogSampler(logging.Filter):
+    """
+    Logs only a fraction (`sample_rate`) of the successful (2xx) Uvicorn access
+    log lines. Other responses (redirects, errors) and requests slower than
+    `slow_threshold` seconds are always logged.
+    """
+
+    def __init__(self, sample_rate: float, slow_threshold: float) -> None:
+        super().__init__()
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        duration = request_duration.get()
+        record.duration = duration
+
+        checkouts = pool_checkouts.get()
+        if checkouts is not None:
+            record.db_checkouts = checkouts.count
+            record.db_checkout_duration = checkouts.duration
+
+        if self.sample_rate >= 1:
+            return True
+
+        status = record.args[-1] if isinstance(record.args, tuple) else None
+        if not isinstance(status, int) or not (
+            HTTPStatus.OK <= status < HTTPStatus.MULTIPLE_CHOICES
+        ):
+            return True
+
+        if duration is not None and duration >= self.slow_threshold:
+            return True
+
+        return random.random() < self.sample_rate
+
+
+def _are_immutable(args: tuple[object, ...] | Mapping[str, object]) -> bool:
+    values = args.values() if isinstance(args, Mapping) else args
+    return all(isinstance(value, IMMUTABLE_ARG_TYPES) for value in values)
+
+
+def _duration_ms(record: logging.LogRecord) -> float | None:
+    duration = getattr(record, "duration", None)
+    return None if duration is None else round(duration * 1000, 3)
+
+
+def _db_checkout_ms(record: logging.LogRecord) -> float | None:
+    duration = getattr(record, "db_checkout_duration", None)
+    return None if duration is None else round(duration * 1000, 3)
+
+
+def create_app_logger() -> tuple[logging.Logger, BoundedQueueHandler]:
     """
     Creates and configures an enhanced logger for the application.
 
+    Log calls only put the record in a bounded queue. Formatting, writing and
+    rotation of the log files happens on a background thread, so that logging
+    doesn't block the event loop. Use %-style arguments (`log.info("%s", x)`)
+    instead of f-strings so that the message is only formatted if it's logged.
+
     Returns:
-        logging.Logger: A configured logger instance with console and file
-        handlers, rotation, and correlation ID support.
+        tuple[logging.Logger, BoundedQueueHandler]: A configured logger instance
+        with console and file handlers, rotation, and correlation ID support, and
+        the queue handler attached to it.
 
     Example:
     ```python
@@ -32,19 +216,20 @@ def create_app_logger() -> logging.Logger:
     # Prevent logs from propagating to the root logger
     app_logger.propagate = False
 
-    formatter = logging.Formatter(
-        fmt=settings.logger_format,
-        datefmt=settings.logger_date_format,
-    )
+    formatter: logging.Formatter
+    if settings.logger_output == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            fmt=settings.logger_format,
+            datefmt=settings.logger_date_format,
+        )
 
     # Stream handler for logging to the console (stdout)
 
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
     console_handler.setLevel(settings.logger_level)
-    console_handler.addFilter(
-        CorrelationIdFilter(uuid_length=32, default_value="-"),
-    )
 
     # Rotating file handler for logging to a file with log rotation
 
@@ -58,10 +243,6 @@ def create_app_logger() -> logging.Logger:
     # Use INFO level or higher for file logs
     file_handler.setLevel(logging.INFO)
 
-    file_handler.addFilter(
-        CorrelationIdFilter(uuid_length=32, default_value="-"),
-    )
-
     # Add a separate file handler for ERROR level logs
 
     error_file_handler = RotatingFileHandler(
@@ -74,15 +255,35 @@ def create_app_logger() -> logging.Logger:
     # Use INFO level or higher for file logs
     error_file_handler.setLevel(logging.ERROR)
 
-    error_file_handler.addFilter(
+    # Queue handler, the only handler attached to the logger. Correlation ID is
+    # added here as it's only available in the context of the request
+
+    queue_handler = BoundedQueueHandler(
+        queue.Queue(maxsize=settings.logger_queue_size),
+        drop_policy=settings.logger_queue_drop_policy,
+    )
+    queue_handler.setLevel(settings.logger_level)
+    queue_handler.addFilter(
         CorrelationIdFilter(uuid_length=32, default_value="-"),
     )
 
+    # Background thread which passes the queued records to the actual handlers
+
+    listener = QueueListener(
+        queue_handler.queue,
+        console_handler,
+        file_handler,
+        error_file_handler,
+        respect_handler_level=True,
+    )
+    listener.start()
+
+    # Flush the queued records before exiting
+    atexit.register(listener.stop)
+
     # Attach handlers to the logger
 
-    app_logger.addHandler(console_handler)
-    app_logger.addHandler(file_handler)
-    app_logger.addHandler(error_file_handler)
+    app_logger.addHandler(queue_handler)
 
     # Intercept Uvicorn's log and use the same handlers (but not altering the
     # actual Uvicorn log configuration)
@@ -95,7 +296,15 @@ def create_app_logger() -> logging.Logger:
     uvicorn_access_logger.handlers = app_logger.handlers
     uvicorn_access_logger.setLevel(settings.logger_level)
 
-    return app_logger
+    # Sampling happens on the logger, so that skipped lines aren't even queued
+    uvicorn_access_logger.addFilter(
+        AccessLogSampler(
+            sample_rate=settings.logger_access_sample_rate,
+            slow_threshold=settings.logger_access_slow_threshold,
+        )
+    )
+
+    return app_logger, queue_handler
 
 
-log = create_app_logger()
+log, log_queue_handler = create_app_logger()
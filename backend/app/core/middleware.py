@@ -0,0 +1,62 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.logger import PoolCheckouts, pool_checkouts, request_duration
+from app.utils.enums import HttpHeader
+
+
+class ResponseHeadersMiddleware:
+    """
+    Adds security headers, the request processing time and the time spent checking
+    out DB connections (i.e. connection contention) to every HTTP response.
+
+    This is a pure ASGI middleware: it only rewrites the `http.response.start`
+    message. Unlike `@app.middleware("http")` (`BaseHTTPMiddleware`), it doesn't
+    wrap the request in extra tasks nor streams the response body through itself.
+    """
+
+    security_headers: list[tuple[bytes, bytes]] = [
+        # Prevent MIME type sniffing
+        (b"x-content-type-options", b"nosniff"),
+        # Prevent Clickjacking
+        (b"x-frame-options", b"DENY"),
+        # Enable XSS protection in browsers
+        (b"x-xss-protection", b"1; mode=block"),
+    ]
+
+    process_time_header = HttpHeader.PROCESS_TIME.value.lower().encode("latin-1")
+    db_checkout_time_header = HttpHeader.DB_CHECKOUT_TIME.value.lower().encode(
+        "latin-1"
+    )
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        checkouts = PoolCheckouts()
+        pool_checkouts.set(checkouts)
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                process_time = time.perf_counter() - start_time
+                request_duration.set(process_time)
+
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    *self.security_headers,
+                    (self.process_time_header, str(process_time).encode("latin-1")),
+                    (
+                        self.db_checkout_time_header,
+                        str(checkouts.duration).encode("latin-1"),
+                    ),
+                ]
+
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
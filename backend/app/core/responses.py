@@ -1,11 +1,37 @@
 from typing import Any
 
+import orjson
 from fastapi import status
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
 
 from app import schemas
 
 Responses = dict[int | str, dict[str, Any]]
 
+
+class JsonResponse(ORJSONResponse):
+    """
+    Default response class of the app. Serializes with `orjson`, which natively
+    handles the types in the responses (UUID, datetime, enums) and is several times
+    faster than the stdlib `json`, hence the content doesn't have to go through
+    `jsonable_encoder` first. Any other type (e.g. an exception in the context of a
+    validation error) is serialized as its string.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=str, option=orjson.OPT_NON_STR_KEYS)
+
+
+def render_json(model: BaseModel) -> bytes:
+    """
+    Body of a response model, as FastAPI would render it (by alias). For the
+    responses that are rendered ahead of time, e.g. to be cached
+    """
+
+    return model.__pydantic_serializer__.to_json(model, by_alias=True)
+
+
 # =======================
 # Base
 # =======================
@@ -135,6 +161,10 @@ upload_style_filters: Responses = {
         "description": "Style filters uploaded",
         "model": schemas.http.UploadStyleFiltersOut,
     },
+    status.HTTP_409_CONFLICT: {
+        "description": "Reused images are being deleted, the upload can be retried",
+        "model": schemas.http.ConflictErrorResponse,
+    },
     **_base_responses,
     **_bad_request_response,
     **_unauthorized_response,
@@ -171,3 +201,19 @@ get_style_filters: Responses = {
     **_bad_request_response,
     **_unauthorized_response,
 }
+
+
+# =======================
+# Metrics
+# =======================
+
+
+metrics: Responses = {
+    status.HTTP_200_OK: {
+        "description": "Get runtime metrics of the application",
+        "model": schemas.http.MetricsOut,
+    },
+    **_unauthorized_response,
+    **_not_found_response,
+    **_base_responses,
+}
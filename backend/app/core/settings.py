@@ -1,10 +1,19 @@
 from typing import Literal, Self
 from urllib.parse import quote_plus
 
-from pydantic import AnyHttpUrl, Json, ValidationInfo, field_validator, model_validator
+from pydantic import (
+    AnyHttpUrl,
+    Field,
+    Json,
+    ValidationInfo,
+    field_validator,
+    model_validator,
+)
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 LoggerLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+LoggerDropPolicy = Literal["drop_new", "drop_old", "block"]
+LoggerOutput = Literal["text", "json"]
 
 
 class AuthSettings(BaseSettings):
@@ -16,11 +25,19 @@ class AuthSettings(BaseSettings):
 
     auth_crypto_hash_key: bytes
 
+    # Authenticated users are cached (per process) to avoid a DB query on every
+    # request. Cache is invalidated on changes made by this process, other processes
+    # pick up the changes once the entry expires
+    auth_user_cache_enabled: bool = True
+    auth_user_cache_ttl: float = 30  # In seconds
+    auth_user_cache_size: int = 10_000
+
 
 class CloudinarySettings(BaseSettings):
-    cloudinary_cloud_name: str
-    cloudinary_cloud_key: str
-    cloudinary_cloud_secret: str
+    # Required only when Cloudinary is the storage backend
+    cloudinary_cloud_name: str | None = None
+    cloudinary_cloud_key: str | None = None
+    cloudinary_cloud_secret: str | None = None
 
     @property
     def cloudinary_url(self) -> str:
@@ -42,6 +59,35 @@ class DatabaseSettings(BaseSettings):
     # SQLAlchemy connection URL, either passed directly or constructed
     db_sqlalchemy_url: str | None = None
 
+    # Connection pool: connections kept open, additional connections allowed above
+    # it, seconds to wait for a free connection and seconds after which a
+    # connection is replaced (to prevent stale connections)
+    db_pool_size: int = Field(10, ge=1)
+    db_max_overflow: int = Field(20, ge=0)
+    db_pool_timeout: float = Field(30, gt=0)
+    db_pool_recycle: int = 30 * 60
+
+    # Ping the connection on every checkout. Costs a round trip per checkout, but
+    # avoids failing a request on a connection that was closed by the server
+    db_pool_pre_ping: bool = True
+
+    # Prepared statements cached per connection by the asyncpg driver, and
+    # compiled statements cached by SQLAlchemy (shared by all connections)
+    db_prepared_statement_cache_size: int = Field(100, ge=0)
+    db_compiled_cache_size: int = Field(500, ge=0)
+
+    # Connect through PgBouncer in transaction pooling mode, where a connection's
+    # prepared statements can't be reused as the server connection changes. This
+    # disables the prepared statement cache and uses unique statement names
+    db_pgbouncer: bool = False
+
+    # Read replicas, expected to be a JSON-formatted list of SQLAlchemy URLs. The
+    # read-only requests are spread over them (round-robin) and fall back to the
+    # primary if none of them is healthy. The pool settings apply to each of them
+    db_replica_urls: Json[list[str]] = "[]"  # type: ignore[assignment]
+    db_replica_health_check_interval: float = Field(5, gt=0)  # In seconds
+    db_replica_health_check_timeout: float = Field(2, gt=0)  # In seconds
+
     @field_validator("db_sqlalchemy_url", mode="before")
     @classmethod
     def create_sqlalchemy_url(
@@ -105,6 +151,10 @@ class LoggerSettings(BaseSettings):
     # Date format for timestamps in log messages
     logger_date_format: str = "%d-%m-%YT%H:%M:%SZ"
 
+    # Output of the log records: `text` uses `logger_format`, `json` writes one
+    # compact JSON object per line (easier and cheaper to parse downstream)
+    logger_output: LoggerOutput = "text"
+
     logger_file_path: str = "./logs/app.log"
     logger_file_max_size: int = 5 * 1024 * 1024  # 5 MB per log file
     logger_file_backup_count: int = 3  # Keep 3 backup files
@@ -113,13 +163,112 @@ class LoggerSettings(BaseSettings):
     logger_error_file_max_size: int = 5 * 1024 * 1024  # 5 MB per log file
     logger_error_file_backup_count: int = 3  # Keep 3 backup files
 
+    # Log records are queued and written by a background thread. When the queue is
+    # full, records are dropped (newest or oldest) or the caller waits for room
+    logger_queue_size: int = 10_000
+    logger_queue_drop_policy: LoggerDropPolicy = "drop_new"
+
+    # Fraction of successful (2xx) access log lines that are logged. Other
+    # responses and requests slower than the threshold (seconds) are always logged
+    logger_access_sample_rate: float = Field(1.0, ge=0, le=1)
+    logger_access_slow_threshold: float = Field(1.0, ge=0)
+
+
+class StyleFilterSettings(BaseSettings):
+    """
+    This class defines how the total number of style filters in a feed is computed:
+
+    - `exact`: run `COUNT(*)` on every request
+    - `cached`: run `COUNT(*)` and cache it for a while (invalidated on changes)
+    - `estimate`: use the planner's row estimate for the main feed (cheapest but
+      approximate, and includes banned filters), and cached count for author feeds
+    """
+
+    style_filter_total_mode: Literal["exact", "cached", "estimate"] = "cached"
+    style_filter_total_cache_ttl: float = 30  # In seconds
+    style_filter_total_cache_size: int = 1024  # Max number of cached feeds
+
+
+class FeedCacheSettings(BaseSettings):
+    """
+    This class defines the cache of the main feed responses (anonymous
+    `GET /api/filter`, first pages only), which are invalidated on changes:
+
+    - `memory`: in-process, hence every worker process has its own cache and only
+      sees its own changes (the others' changes show up after the TTL)
+    - `redis`: shared by all of the worker processes, requires the `redis` extra
+    """
+
+    feed_cache_enabled: bool = True
+    feed_cache_backend: Literal["memory", "redis"] = "memory"
+    feed_cache_redis_url: str = "redis://localhost:6379/0"
+    feed_cache_ttl: float = Field(30, gt=0)  # In seconds
+    feed_cache_size: int = 256  # Max number of cached pages (in-process only)
+
+    # Pages starting at or after this offset aren't cached
+    feed_cache_max_offset: int = Field(100, ge=0)
+
+
+class StorageSettings(BaseSettings):
+    """
+    This class defines where the style filter images are stored.
+
+    - `cloudinary`: Cloudinary (requires the Cloudinary settings)
+    - `local`: local disk, under `storage_local_path`, served from
+      `storage_local_base_url` (by default the app's `/static` mount)
+    """
+
+    storage_backend: Literal["cloudinary", "local"] = "cloudinary"
+    storage_local_path: str = "./static/style-filters"
+    storage_local_base_url: str = "http://localhost:8000/static/style-filters"
+
+    # Images of deleted style filters are deleted in the background, in batches (100
+    # is the max number of images per delete call of Cloudinary). Failed deletions
+    # are retried with exponential backoff, between the base and max delays. A batch
+    # is leased to the worker handling it, and is handed out again if it isn't done
+    # by the end of the lease (e.g. the worker crashed)
+    storage_deletion_worker_enabled: bool = True
+    storage_deletion_batch_size: int = 100
+    storage_deletion_poll_interval: float = 5  # In seconds
+    storage_deletion_lease: float = Field(5 * 60, gt=0)  # In seconds
+    storage_deletion_retry_base_delay: float = 5  # In seconds
+    storage_deletion_retry_max_delay: float = 60 * 60  # In seconds
+
+
+class UploadSettings(BaseSettings):
+    """
+    This class defines how filter uploads are pushed to the storage service. Uploads
+    are blocking calls and are run in a bounded thread pool, off the event loop.
+    """
+
+    # Number of threads used to run blocking storage calls
+    upload_max_workers: int = 8
+
+    # Max number of uploads running at once across the whole process
+    upload_max_concurrency: int = 8
+
+    # Max number of uploads running at once for a single request
+    upload_max_concurrency_per_request: int = 4
+
+    # Max size of the body of an upload request (all of the files together). Files
+    # are kept in memory while the request is handled
+    upload_max_request_size: int = 25 * 1024 * 1024  # 25 MB
+
+    # Number of processes rendering the derivatives (blur, thumbnail) of uploads
+    # stored locally
+    upload_derivative_workers: int = 2
+
 
 class Settings(
     AuthSettings,
     CloudinarySettings,
     DatabaseSettings,
     EmailSettings,
+    FeedCacheSettings,
     LoggerSettings,
+    StorageSettings,
+    StyleFilterSettings,
+    UploadSettings,
 ):
     """
     This is the main settings class that aggregates database, logger, and other
@@ -149,6 +298,10 @@ class Settings(
     # Debug mode, set this to True for development environments
     debug: bool = False
 
+    # Bearer token required by the metrics endpoint, which exposes the internals of
+    # the app (pools, queues, caches). The endpoint is disabled if it isn't set
+    metrics_token: str | None = None
+
     # Environment in which this application is running
     environment: Literal["development", "production", "testing"] = "development"
 
@@ -163,6 +316,18 @@ class Settings(
             self.logger_level = "DEBUG"
         return self
 
+    @model_validator(mode="after")
+    def check_storage_backend(self) -> Self:
+        """Cloudinary credentials are required if it's the storage backend"""
+
+        if self.storage_backend == "cloudinary" and not (
+            self.cloudinary_cloud_name
+            and self.cloudinary_cloud_key
+            and self.cloudinary_cloud_secret
+        ):
+            raise ValueError("Cloudinary settings are required for its storage")
+        return self
+
 
 # Instantiate the settings object, loading from environment variables and defaults.
 settings = Settings()  # type: ignore[call-arg]
@@ -1,3 +1,5 @@
+from .filter_report import filter_report
 from .magic_link import magic_link
+from .storage_deletion import storage_deletion
 from .style_filter import style_filter
 from .user import user
@@ -0,0 +1,62 @@
+from uuid import UUID
+
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import FilterReport, StyleFilter
+
+
+class FilterReportCRUD:
+    @staticmethod
+    async def create(
+        db: AsyncSession,
+        user_id: int,
+        filter_public_id: UUID,
+    ) -> int | None:
+        """
+        Report the filter, returns its ID, or `None` if the filter doesn't exist or
+        the user has already reported it
+        """
+
+        result = await db.execute(
+            insert(FilterReport)
+            .from_select(
+                [FilterReport.user_id, FilterReport.filter_id],
+                select(literal(user_id), StyleFilter.id).where(
+                    StyleFilter.public_filter_id == filter_public_id
+                ),
+            )
+            .on_conflict_do_nothing()
+            .returning(FilterReport.filter_id)
+        )
+
+        return result.scalar()
+
+    @staticmethod
+    async def delete(
+        db: AsyncSession,
+        user_id: int,
+        filter_public_id: UUID,
+    ) -> int | None:
+        """
+        Withdraw the report of the filter, returns its ID, or `None` if the filter
+        doesn't exist or the user hasn't reported it
+        """
+
+        result = await db.execute(
+            delete(FilterReport)
+            .where(
+                FilterReport.user_id == user_id,
+                FilterReport.filter_id
+                == select(StyleFilter.id)
+                .where(StyleFilter.public_filter_id == filter_public_id)
+                .scalar_subquery(),
+            )
+            .returning(FilterReport.filter_id)
+        )
+
+        return result.scalar()
+
+
+filter_report = FilterReportCRUD()
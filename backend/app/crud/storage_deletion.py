@@ -0,0 +1,101 @@
+from sqlalchemy import delete, func, insert, literal_column, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import StorageDeletion
+
+
+class StorageDeletionCRUD:
+    @staticmethod
+    async def create_many(db: AsyncSession, img_ids: set[str]) -> None:
+        """Queue the images for deletion, committed along with the caller's changes"""
+
+        if len(img_ids) == 0:
+            return
+
+        await db.execute(
+            insert(StorageDeletion),
+            [{"img_id": img_id} for img_id in img_ids],
+        )
+
+    @staticmethod
+    async def get_queued_img_ids(db: AsyncSession, img_ids: set[str]) -> set[str]:
+        """Images queued for deletion, which might be deleted at any time"""
+
+        if len(img_ids) == 0:
+            return set()
+
+        result = await db.scalars(
+            select(StorageDeletion.img_id)
+            .where(StorageDeletion.img_id.in_(img_ids))
+            .distinct()
+        )
+
+        return set(result)
+
+    @staticmethod
+    async def claim_due(
+        db: AsyncSession,
+        limit: int,
+        *,
+        lease: float,
+    ) -> list[StorageDeletion]:
+        """
+        Lease a batch of due deletions: their next attempt is pushed `lease` seconds
+        ahead, so that they aren't due for the other workers once this transaction
+        is committed. Rows locked by other workers are skipped, so that every
+        deletion is claimed once.
+        """
+
+        due = (
+            select(StorageDeletion.id)
+            .where(StorageDeletion.next_attempt_at <= func.now())
+            .order_by(StorageDeletion.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+
+        result = await db.scalars(
+            update(StorageDeletion)
+            .where(StorageDeletion.id.in_(due))
+            .values(
+                next_attempt_at=func.now()
+                + lease * literal_column("interval '1 second'")
+            )
+            .returning(StorageDeletion)
+        )
+
+        return list(result)
+
+    @staticmethod
+    async def delete_many(db: AsyncSession, ids: list[int]) -> None:
+        await db.execute(delete(StorageDeletion).where(StorageDeletion.id.in_(ids)))
+
+    @staticmethod
+    async def retry_later(
+        db: AsyncSession,
+        ids: list[int],
+        *,
+        base_delay: float,
+        max_delay: float,
+        error: str,
+    ) -> None:
+        """Reschedule with exponential backoff (`base_delay * 2^attempts` seconds)"""
+
+        delay = func.least(
+            base_delay * func.power(2, StorageDeletion.attempts),
+            max_delay,
+        )
+
+        await db.execute(
+            update(StorageDeletion)
+            .where(StorageDeletion.id.in_(ids))
+            .values(
+                attempts=StorageDeletion.attempts + 1,
+                next_attempt_at=func.now()
+                + delay * literal_column("interval '1 second'"),
+                last_error=error,
+            )
+        )
+
+
+storage_deletion = StorageDeletionCRUD()
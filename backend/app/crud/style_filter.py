@@ -1,10 +1,54 @@
+from datetime import datetime
 from uuid import UUID
 
-from sqlalchemy import case, delete, desc, func, literal, select, update
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    and_,
+    delete,
+    desc,
+    func,
+    insert,
+    literal,
+    not_,
+    select,
+    text,
+    tuple_,
+    update,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app import schemas
+from app.core import settings
 from app.db.models import StyleFilter, User
-from app.utils import FilterUploadResult
+from app.db.models.style_filter import style_filter_schema
+from app.utils.cache import TTLCache
+from app.utils.filter_storage import FilterUploadResult
+from app.utils.response_cache import ResponseCache, create_response_cache_backend
+
+from .storage_deletion import StorageDeletionCRUD
+
+# Total number of style filters in a feed. Key is the public id of the author for
+# author feeds and `None` for the main feed
+feed_totals: TTLCache[UUID | None, int] = TTLCache(
+    max_size=settings.style_filter_total_cache_size,
+    ttl=settings.style_filter_total_cache_ttl,
+    enabled=settings.style_filter_total_mode != "exact",
+)
+
+# Serialized responses of the first pages of the main feed. Tagged with the feed
+# (which filters are in it) and with every filter on the page (their content)
+feed_pages = ResponseCache(
+    create_response_cache_backend(),
+    ttl=settings.feed_cache_ttl,
+    enabled=settings.feed_cache_enabled,
+)
+FEED_TAG = "feed"
+
+
+def filter_tag(filter_id: int) -> str:
+    return f"filter:{filter_id}"
 
 
 class StyleFilterCRUD:
@@ -12,22 +56,97 @@ class StyleFilterCRUD:
     async def create_many(
         db: AsyncSession,
         style_filters: list[FilterUploadResult],
-        author_id: int,
+        author: schemas.UserPrincipal,
     ) -> list[StyleFilter]:
-        instances: list[StyleFilter] = []
+        """
+        Insert all of the style filters in a single `INSERT ... RETURNING`, the
+        author is attached from the already loaded user instead of being queried
+        """
 
-        for filter in style_filters:
-            instance = StyleFilter.from_upload_result(filter, author_id)
-            instances.append(instance)
-            db.add(instance)
+        result = await db.scalars(
+            insert(StyleFilter).returning(StyleFilter, sort_by_parameter_order=True),
+            [
+                StyleFilter.values_from_upload_result(filter, author.id)
+                for filter in style_filters
+            ],
+        )
+        instances = list(result)
 
         await db.commit()
 
+        author_user = User.from_principal(author)
         for instance in instances:
-            await db.refresh(instance)
+            set_committed_value(instance, "author", author_user)
+
+        StyleFilterCRUD._invalidate_totals({author.public_user_id})
+        await feed_pages.invalidate({FEED_TAG})
 
         return instances
 
+    @staticmethod
+    async def get_uploads_by_content_hash(
+        db: AsyncSession,
+        content_hashes: set[str],
+    ) -> dict[str, FilterUploadResult]:
+        """Already stored images with the given content hashes, by content hash"""
+
+        if len(content_hashes) == 0:
+            return {}
+
+        result = await db.execute(
+            select(
+                StyleFilter.img_id,
+                StyleFilter.base_img_url,
+                StyleFilter.blur_img_url,
+                StyleFilter.small_img_url,
+                StyleFilter.blur_data_url,
+                StyleFilter.content_hash,
+            )
+            .where(
+                StyleFilter.content_hash.in_(content_hashes),
+                StyleFilter.img_id.is_not(None),
+            )
+            .distinct(StyleFilter.content_hash)
+        )
+
+        return {row.content_hash: FilterUploadResult(*row) for row in result}
+
+    @staticmethod
+    async def lock_img_ids(db: AsyncSession, img_ids: set[str]) -> set[str]:
+        """
+        Images which are still used by a style filter. The style filters using them
+        are locked (`FOR KEY SHARE`) until the end of the transaction, hence they
+        can't be deleted (and their images queued for deletion) before the caller's
+        new style filters using the same images are committed.
+        """
+
+        if len(img_ids) == 0:
+            return set()
+
+        result = await db.scalars(
+            select(StyleFilter.img_id)
+            .where(StyleFilter.img_id.in_(img_ids))
+            .with_for_update(read=True, key_share=True)
+        )
+
+        return {img_id for img_id in result if img_id is not None}
+
+    @staticmethod
+    async def get_unreferenced_img_ids(
+        db: AsyncSession,
+        img_ids: set[str],
+    ) -> set[str]:
+        """Images which aren't used by any style filter, and can be deleted"""
+
+        if len(img_ids) == 0:
+            return set()
+
+        result = await db.execute(
+            select(StyleFilter.img_id).where(StyleFilter.img_id.in_(img_ids)).distinct()
+        )
+
+        return img_ids - set(result.scalars())
+
     @staticmethod
     async def get_many_by_ids(
         db: AsyncSession,
@@ -63,24 +182,74 @@ class StyleFilterCRUD:
         author_id: UUID | None = None,
         limit: int = 20,
         offset: int = 0,
-    ) -> tuple[list[StyleFilter], int]:
-        stmt = select(StyleFilter)
-        total_stmt = select(func.count()).select_from(StyleFilter)
+        cursor: schemas.StyleFilterCursor | None = None,
+    ) -> list[Row[tuple[int, datetime, schemas.StyleFilter]]]:
+        """
+        Get a page of style filters, newest first. When `cursor` is given, the page
+        starts right after it (keyset pagination) and `offset` is ignored.
 
-        if author_id is not None:
-            stmt = stmt.join(User).where(User.public_user_id == author_id)
-            total_stmt = total_stmt.join(User).where(User.public_user_id == author_id)
+        Rows are `(id, created_at, filter)`, `filter` being the schema, which is
+        built without loading ORM objects. Style filters of deleted authors aren't
+        included, as the schema requires an author.
+        """
+
+        stmt = (
+            select(StyleFilter.id, StyleFilter.created_at, style_filter_schema)
+            .join(StyleFilter.author)
+            .where(StyleFilterCRUD._feed_condition(author_id))
+        )
+
+        if cursor is not None:
+            stmt = stmt.where(
+                tuple_(StyleFilter.created_at, StyleFilter.id)
+                < tuple_(literal(cursor.created_at), literal(cursor.id))
+            )
         else:
-            stmt = stmt.where(StyleFilter.is_banned.is_not(True))
-            total_stmt = total_stmt.where(StyleFilter.is_banned.is_not(True))
+            stmt = stmt.offset(offset)
 
         result = await db.execute(
-            stmt.limit(limit).offset(offset).order_by(desc(StyleFilter.created_at))
+            stmt.limit(limit).order_by(
+                desc(StyleFilter.created_at),
+                desc(StyleFilter.id),
+            )
         )
 
-        total = await db.execute(total_stmt)
+        return list(result)
+
+    @staticmethod
+    async def count(db: AsyncSession, *, author_id: UUID | None = None) -> int:
+        """
+        Get the total number of style filters in a feed. Depending on the
+        `style_filter_total_mode` setting, this might be cached or an estimate.
+        """
 
-        return list(result.scalars()), total.scalar() or 0
+        total = feed_totals.get(author_id)
+        if total is not None:
+            return total
+
+        if author_id is None and settings.style_filter_total_mode == "estimate":
+            result = await db.execute(
+                text(
+                    "SELECT reltuples::bigint FROM pg_class "
+                    f"WHERE oid = '{StyleFilter.__tablename__}'::regclass"
+                )
+            )
+
+            # Estimate is -1 if the table hasn't been analyzed yet
+            estimate = result.scalar()
+            if estimate is not None and estimate > 0:
+                feed_totals.set(author_id, estimate)
+                return estimate
+
+        result = await db.execute(
+            select(func.count())
+            .select_from(StyleFilter)
+            .where(StyleFilterCRUD._feed_condition(author_id))
+        )
+
+        total = result.scalar() or 0
+        feed_totals.set(author_id, total)
+        return total
 
     @staticmethod
     async def get_report_count(db: AsyncSession, filter_public_id: UUID) -> int | None:
@@ -95,32 +264,112 @@ class StyleFilterCRUD:
     @staticmethod
     async def change_report_count(
         db: AsyncSession,
-        filter_public_id: UUID,
-        is_increment: bool,
-        is_banned: bool,
+        filter_id: int,
         *,
+        is_increment: bool,
+        max_report_count: int,
         commit: bool = True,
-    ) -> None:
-        await db.execute(
+    ) -> bool:
+        """
+        Atomically change the report count, (un)banning the filter once it's above
+        `max_report_count`. Returns whether the filter is banned.
+
+        Cached feed pages are invalidated right away if `commit` is `False`, the
+        caller should commit soon after.
+        """
+
+        report_count = StyleFilter.report_count + (1 if is_increment else -1)
+
+        result = await db.execute(
             update(StyleFilter)
-            .where(StyleFilter.public_filter_id == filter_public_id)
+            .where(StyleFilter.id == filter_id)
             .values(
-                report_count=case(
-                    (literal(is_increment), StyleFilter.report_count + 1),
-                    else_=StyleFilter.report_count - 1,
-                ),
-                is_banned=case((literal(is_banned), True), else_=False),
+                report_count=report_count,
+                is_banned=report_count > max_report_count,
             )
+            .returning(StyleFilter.report_count, StyleFilter.is_banned)
         )
+        new_report_count, is_banned = result.one()
 
         if commit:
             await db.commit()
 
+        # Report count is shown on the pages with the filter, and the ban status
+        # decides whether it's in the main feed or not
+        tags = {filter_tag(filter_id)}
+
+        boundary = max_report_count + 1 if is_increment else max_report_count
+        if new_report_count == boundary:
+            StyleFilterCRUD._invalidate_totals(set())
+            tags.add(FEED_TAG)
+
+        await feed_pages.invalidate(tags)
+
+        return is_banned
+
     @staticmethod
-    async def delete_many(db: AsyncSession, filter_ids: list[int]) -> None:
-        await db.execute(
-            delete(StyleFilter).where(StyleFilter.id.in_(filter_ids)),
+    async def delete_many(
+        db: AsyncSession,
+        filter_ids: list[int],
+        *,
+        commit: bool = True,
+    ) -> None:
+        """
+        Delete the style filters, and queue their images which aren't used by any
+        other style filter for deletion from the storage (in the same transaction).
+
+        Cached feed pages are invalidated right away if `commit` is `False`, the
+        caller should commit soon after.
+        """
+
+        result = await db.execute(
+            delete(StyleFilter)
+            .where(StyleFilter.id.in_(filter_ids))
+            .returning(
+                StyleFilter.img_id,
+                StyleFilter.is_banned,
+                select(User.public_user_id)
+                .where(User.id == StyleFilter.author_id)
+                .scalar_subquery()
+                .label("author_public_id"),
+            )
+        )
+        rows = result.all()
+
+        img_ids = await StyleFilterCRUD.get_unreferenced_img_ids(
+            db, {row.img_id for row in rows if row.img_id is not None}
+        )
+        await StorageDeletionCRUD.create_many(db, img_ids)
+
+        if commit:
+            await db.commit()
+
+        StyleFilterCRUD._invalidate_totals(
+            {row.author_public_id for row in rows if row.author_public_id is not None}
         )
 
+        # Banned filters aren't in the main feed
+        if any(not row.is_banned for row in rows):
+            await feed_pages.invalidate({FEED_TAG})
+
+    @staticmethod
+    def _feed_condition(author_id: UUID | None) -> ColumnElement[bool]:
+        if author_id is not None:
+            author_stmt = select(User.id).where(User.public_user_id == author_id)
+            return StyleFilter.author_id == author_stmt.scalar_subquery()
+
+        # Style filters of deleted authors aren't listed (see `get_many`), hence
+        # aren't counted either. They're rare, hence the partial feed index (whose
+        # predicate is `not_(StyleFilter.is_banned)`) is still used
+        return and_(not_(StyleFilter.is_banned), StyleFilter.author_id.is_not(None))
+
+    @staticmethod
+    def _invalidate_totals(author_ids: set[UUID]) -> None:
+        """Invalidate the main feed total and the totals of the given authors"""
+
+        feed_totals.delete(None)
+        for author_id in author_ids:
+            feed_totals.delete(author_id)
+
 
 style_filter = StyleFilterCRUD()
@@ -1,14 +1,23 @@
 from datetime import UTC, datetime, timedelta
 from uuid import UUID
 
-from sqlalchemy import select, update
+from sqlalchemy import select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import utils
-from app.core import log
+from app import schemas, utils
+from app.core import log, settings
 from app.core.exceptions import InternalServerError
 from app.db.models import MagicLink, User
+from app.utils.cache import TTLCache
+
+# Authenticated users by their public id. Code which changes what a principal holds
+# (e.g. bans a user) must delete the user's entry once the change is committed
+user_principals: TTLCache[UUID, schemas.UserPrincipal] = TTLCache(
+    max_size=settings.auth_user_cache_size,
+    ttl=settings.auth_user_cache_ttl,
+    enabled=settings.auth_user_cache_enabled,
+)
 
 
 class UserCRUD:
@@ -39,11 +48,11 @@ class UserCRUD:
 
             return user, hashed
         except SQLAlchemyError as e:
-            log.error(f"Failed to create user account: {e}")
+            log.error("Failed to create user account: %s", e)
             await db.rollback()
             raise InternalServerError() from e
         except Exception as e:
-            log.error(f"Failed to create user account: {e}")
+            log.error("Failed to create user account: %s", e)
             await db.rollback()
             raise InternalServerError() from e
 
@@ -56,28 +65,36 @@ class UserCRUD:
         result = await db.execute(stmt)
         return result.scalar()
 
+    @staticmethod
+    async def get_principal(
+        db: AsyncSession,
+        public_user_id: UUID,
+    ) -> schemas.UserPrincipal | None:
+        """Get the user as a principal, from the cache if possible"""
+
+        principal = user_principals.get(public_user_id)
+        if principal is not None:
+            return principal
+
+        user = await UserCRUD.get_by_public_user_id(db, public_user_id)
+        if user is None:
+            return None
+
+        principal = schemas.UserPrincipal.model_validate(user)
+
+        # Reads of a replica are cached too. A lagging replica might return the user
+        # as it was before a change which has just deleted the entry (e.g. a ban),
+        # which is then served until the entry expires, like the changes made by
+        # the other processes
+        user_principals.set(public_user_id, principal)
+
+        return principal
+
     @staticmethod
     async def get_by_email(db: AsyncSession, email: str) -> User | None:
         stmt = select(User).where(User.email == email).limit(1)
         result = await db.execute(stmt)
         return result.scalar()
 
-    @staticmethod
-    async def update_banned_post_ids(
-        db: AsyncSession,
-        user_id: int,
-        reported_filter_ids: list[int],
-        *,
-        commit: bool = True,
-    ) -> None:
-        await db.execute(
-            update(User)
-            .where(User.id == user_id)
-            .values(reported_filter_ids=reported_filter_ids)
-        )
-
-        if commit:
-            await db.commit()
-
 
 user = UserCRUD()
@@ -1,35 +1,49 @@
 from typing import Any
 
-from sqlalchemy import event
-from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine
+from sqlalchemy import event, make_url
+from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase, InstanceState
 from sqlalchemy.orm.attributes import Event, InstrumentedAttribute
 from sqlalchemy.util.langhelpers import symbol
 
 from app.core import settings
 from app.core.exceptions import NonUpdateableColumnError
+from app.db.pool import create_engine
+from app.db.routing import Replica, ReplicaSet, RoutingAsyncSession
 
-# Create an asynchronous engine with connection pooling
-engine = create_async_engine(
-    str(settings.db_sqlalchemy_url),
-    echo=settings.debug,  # Enable SQL query logging if in debug mode
-    pool_size=10,  # Maximum number of connections in the pool
-    max_overflow=20,  # Additional connections allowed above pool_size
-    # Wait 30 seconds for a connection before throwing an error
-    pool_timeout=30,
-    # Recycle connections every 30 minutes to prevent stale connections
-    pool_recycle=1800,
-    pool_pre_ping=True,  # Ping the database to check if the connection is alive
+# Create an asynchronous engine with connection pooling, configured by the settings
+engine = create_engine(str(settings.db_sqlalchemy_url))
+
+# Read replicas (if any), with the same settings
+replicas = ReplicaSet(
+    [
+        Replica(make_url(url).render_as_string(hide_password=True), create_engine(url))
+        for url in settings.db_replica_urls
+    ]
 )
 
 # Create an async session factory using the engine
 AsyncDbSession = async_sessionmaker(
     bind=engine,
+    class_=RoutingAsyncSession,
+    replicas=replicas,
     autocommit=False,  # Manually commit transactions
     autoflush=False,  # Manually flush changes to the database
     expire_on_commit=False,  # Keep objects in memory after commit
 )
 
+# Sessions for read-only units of work, routed to a replica if there is a healthy
+# one. Anything that reads its own (or very recent) writes should use the primary
+AsyncReadDbSession = async_sessionmaker(
+    bind=engine,
+    class_=RoutingAsyncSession,
+    replicas=replicas,
+    read_only=True,
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 class BaseDbModel(AsyncAttrs, DeclarativeBase):
     pass
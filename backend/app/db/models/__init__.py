@@ -1,5 +1,7 @@
 from ..base import BaseDbModel
 
 from .user import User  # isort: split
+from .filter_report import FilterReport
 from .magic_link import MagicLink
+from .storage_deletion import StorageDeletion
 from .style_filter import StyleFilter
@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDbModel
+from app.db.models.style_filter import StyleFilter
+from app.db.models.user import User
+
+
+class FilterReport(BaseDbModel):
+    """
+    A report of a style filter by a user. The primary key ensures that a user can
+    report a filter once, even under concurrent requests.
+    """
+
+    __tablename__ = "filter_reports"
+
+    # Composite primary key `(user_id, filter_id)`: a user reports a filter once,
+    # and whether a user has reported a filter is a primary key lookup
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey(User.id, ondelete="CASCADE"),
+        primary_key=True,
+    )
+    filter_id: Mapped[int] = mapped_column(
+        ForeignKey(StyleFilter.id, ondelete="CASCADE"),
+        primary_key=True,
+        # Reports of a filter are deleted along with it, and the primary key (which
+        # starts with `user_id`) can't be used to find them
+        index=True,
+    )
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=func.now(),
+    )
+
+    def __str__(self) -> str:
+        return f"FilterReport({self.user_id}, {self.filter_id})"
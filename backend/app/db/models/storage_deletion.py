@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import BaseDbModel
+
+
+class StorageDeletion(BaseDbModel):
+    """
+    Outbox of images to be deleted from the storage service. Rows are written in the
+    same transaction that deletes the style filters, and are drained by the storage
+    deletion worker, so that requests don't wait for the storage service and a crash
+    can't leave orphaned images behind.
+    """
+
+    __tablename__ = "storage_deletions"
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+
+    # ID provided by the storage service
+    img_id: Mapped[str] = mapped_column(String(255))
+
+    # Number of failed attempts, and when the next attempt is due (backoff)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=func.now(),
+        index=True,
+    )
+    last_error: Mapped[str | None] = mapped_column(Text)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=func.now(),
+    )
+
+    def __str__(self) -> str:
+        return f"StorageDeletion({self.id}, {self.img_id}, {self.attempts})"
@@ -1,5 +1,6 @@
+from collections.abc import Callable, Sequence
 from datetime import datetime
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 from uuid import uuid4
 
 from sqlalchemy import (
@@ -7,12 +8,16 @@ from sqlalchemy import (
     CheckConstraint,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
+    Row,
+    Select,
     String,
     func,
+    not_,
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import Bundle, Mapped, mapped_column, relationship
 
 from app import schemas
 from app.db.base import BaseDbModel, make_column_unupdateable
@@ -40,9 +45,18 @@ class StyleFilter(BaseDbModel):
     blur_img_url: Mapped[str] = mapped_column(String(2048))
     small_img_url: Mapped[str] = mapped_column(String(2048))
 
+    # Tiny blurred preview as a data URL, inlined in the responses as placeholder.
+    # Missing for the filters uploaded before it was introduced
+    blur_data_url: Mapped[str | None] = mapped_column(String(2048))
+
     # ID provided by the storage service, which can be used to delete it. In case
     # we give img url, like paste it, that time we won't have img id and hence optional
-    img_id: Mapped[str | None] = mapped_column(String(255))
+    img_id: Mapped[str | None] = mapped_column(String(255), index=True)
+
+    # SHA-256 of the uploaded image. Filters with the same image share the stored
+    # image (`img_id` and URLs), hence the image can only be deleted from the storage
+    # once none of them references it. Missing for filters uploaded before it
+    content_hash: Mapped[str | None] = mapped_column(String(64), index=True)
 
     # Is the image uploaded by an external user or the platform itself
     is_official: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -77,9 +91,10 @@ class StyleFilter(BaseDbModel):
     author: Mapped["User"] = relationship(
         back_populates="style_filters",
         #
-        # When a StyleFilter is loaded, load its author (if there) in a single
-        # JOIN query. This will use single query
-        lazy="joined",
+        # Author isn't needed by most of the queries (e.g. ownership checks only need
+        # `author_id`), so it's loaded only when a CRUD method asks for it with a
+        # loader option. Accessing it otherwise raises an error
+        lazy="raise",
         #
         # `passive_deletes="all"` tells SQLAlchemy not to process related objects when
         # deleting a parent object
@@ -99,35 +114,95 @@ class StyleFilter(BaseDbModel):
             f"{self.author_id})"
         )
 
-    @classmethod
-    def from_upload_result(
-        cls,
+    @staticmethod
+    def values_from_upload_result(
         upload_result: "FilterUploadResult",
         author_id: int,
-    ) -> "StyleFilter":
-        return cls(
-            base_img_url=upload_result.base_img_url,
-            blur_img_url=upload_result.blur_img_url,
-            small_img_url=upload_result.small_img_url,
-            img_id=upload_result.img_id,
-            author_id=author_id,
-        )
+    ) -> dict[str, Any]:
+        """Column values of a style filter, for (bulk) inserts"""
+
+        return {
+            "base_img_url": upload_result.base_img_url,
+            "blur_img_url": upload_result.blur_img_url,
+            "small_img_url": upload_result.small_img_url,
+            "blur_data_url": upload_result.blur_data_url,
+            "img_id": upload_result.img_id,
+            "content_hash": upload_result.content_hash,
+            "author_id": author_id,
+        }
 
     def to_schema(self) -> schemas.StyleFilter:
-        return schemas.StyleFilter.model_validate(
-            {
-                "filter_id": self.public_filter_id,
-                "author_id": self.author.public_user_id,
-                "img_id": self.img_id,
-                "img_url": self.base_img_url,
-                "blur_img_url": self.blur_img_url,
-                "small_img_url": self.small_img_url,
-                "is_official": self.is_official,
-                "is_banned": self.is_banned,
-                "report_count": self.report_count,
-            }
+        # Values were validated when the style filter was created, hence they aren't
+        # validated again
+        return schemas.StyleFilter.model_construct(
+            filter_id=self.public_filter_id,
+            author_id=self.author.public_user_id,
+            img_id=self.img_id,
+            img_url=self.base_img_url,
+            blur_img_url=self.blur_img_url,
+            small_img_url=self.small_img_url,
+            blur_data_url=self.blur_data_url,
+            is_official=self.is_official,
+            is_banned=self.is_banned,
+            report_count=self.report_count,
         )
 
 
+class StyleFilterSchemaBundle(Bundle[schemas.StyleFilter]):
+    """
+    Columns of `schemas.StyleFilter`, labelled by its field names, which are read
+    straight into the schema (like `StyleFilter.to_schema`) instead of ORM objects.
+    The query has to join the author.
+    """
+
+    def create_row_processor(
+        self,
+        query: Select[Any],
+        procs: Sequence[Callable[[Row[Any]], Any]],
+        labels: Sequence[str],
+    ) -> Callable[[Row[Any]], schemas.StyleFilter]:
+        def proc(row: Row[Any]) -> schemas.StyleFilter:
+            return schemas.StyleFilter.model_construct(
+                **{label: process(row) for label, process in zip(labels, procs)}
+            )
+
+        return proc
+
+
+style_filter_schema = StyleFilterSchemaBundle(
+    "filter",
+    StyleFilter.public_filter_id.label("filter_id"),
+    User.public_user_id.label("author_id"),
+    StyleFilter.img_id,
+    StyleFilter.base_img_url.label("img_url"),
+    StyleFilter.blur_img_url,
+    StyleFilter.small_img_url,
+    StyleFilter.blur_data_url,
+    StyleFilter.is_official,
+    StyleFilter.is_banned,
+    StyleFilter.report_count,
+)
+
+
+# Indexes for keyset pagination of the feeds, which are ordered by (created_at, id)
+Index(
+    "ix_style_filters_created_at_id",
+    StyleFilter.created_at.desc(),
+    StyleFilter.id.desc(),
+)
+Index(
+    "ix_style_filters_feed",
+    StyleFilter.created_at.desc(),
+    StyleFilter.id.desc(),
+    postgresql_where=not_(StyleFilter.is_banned),
+)
+Index(
+    "ix_style_filters_author_feed",
+    StyleFilter.author_id,
+    StyleFilter.created_at.desc(),
+    StyleFilter.id.desc(),
+    postgresql_where=StyleFilter.author_id.is_not(None),
+)
+
 make_column_unupdateable(StyleFilter.public_filter_id)
 make_column_unupdateable(StyleFilter.created_at)
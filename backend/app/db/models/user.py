@@ -2,9 +2,15 @@ from datetime import datetime
 from typing import TYPE_CHECKING
 from uuid import uuid4
 
-from sqlalchemy import ARRAY, DateTime, Integer, String, func
+from sqlalchemy import DateTime, String, func
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.orm import (
+    Mapped,
+    make_transient_to_detached,
+    mapped_column,
+    relationship,
+)
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app import schemas
 from app.db.base import BaseDbModel, make_column_unupdateable
@@ -42,12 +48,10 @@ class User(BaseDbModel):
     # ID for profile pic management (for use with S3 or other storage)
     profile_pic_id: Mapped[str | None] = mapped_column(String(32))
 
-    reported_filter_ids: Mapped[list[int]] = mapped_column(
-        ARRAY(Integer),
-        default=list,
-        server_default="{}",
-        nullable=False,
-    )
+    # `reported_filter_ids` column (replaced by `filter_reports`) is unused but kept
+    # in the table, as the instances of the previous release still write to it
+    # during a rolling deploy. It's dropped in a later release, once the reports
+    # written to it in the meantime were copied to `filter_reports`
 
     # Automatically set by the DB when the record is created
     created_at: Mapped[datetime] = mapped_column(
@@ -74,11 +78,12 @@ class User(BaseDbModel):
     )
 
     # One-to-many relationships with StyleFilter
-    style_filters: Mapped["StyleFilter"] = relationship(
+    style_filters: Mapped[list["StyleFilter"]] = relationship(
         back_populates="author",
-        # Performs an immediate join using SQL's JOIN clause when the parent object
-        # is loaded, so both the parent and related objects are fetched in one query.
-        lazy="joined",
+        # A user can have thousands of filters and the user is loaded on every
+        # authenticated request, so they're never loaded implicitly. Accessing them
+        # without an explicit loader option (e.g. `selectinload`) raises an error
+        lazy="raise",
     )
 
     # ===========================
@@ -106,14 +111,36 @@ class User(BaseDbModel):
             profile_pic_url=profile_pic_url,
         )
 
+    @classmethod
+    def from_principal(cls, principal: schemas.UserPrincipal) -> "User":
+        """
+        Detached user with the columns of an already loaded principal, e.g. to be
+        attached to related objects without loading the user again. Other columns
+        aren't loaded and accessing them raises an error.
+        """
+
+        user = cls(
+            id=principal.id,
+            username=principal.username,
+            email=principal.email,
+            profile_pic_url=principal.profile_pic_url,
+            is_active=principal.is_active,
+            is_banned=principal.is_banned,
+        )
+        # Not an update, hence set without firing the unupdateable column check
+        set_committed_value(user, "public_user_id", principal.public_user_id)
+
+        # Mark the columns as loaded (not pending changes)
+        make_transient_to_detached(user)
+        return user
+
     def to_schema(self) -> schemas.User:
-        return schemas.User.model_validate(
-            {
-                "user_id": self.public_user_id,
-                "profile_pic_url": self.profile_pic_url,
-                "email": self.email,
-                "username": self.username,
-            }
+        # Values were validated when the user was created
+        return schemas.User.model_construct(
+            user_id=self.public_user_id,
+            profile_pic_url=self.profile_pic_url,
+            email=self.email,
+            username=self.username,
         )
 
 
@@ -0,0 +1,156 @@
+import time
+from typing import Any, cast
+from uuid import uuid4
+
+from sqlalchemy import PoolProxiedConnection, event
+from sqlalchemy.engine.default import CacheStats, DefaultExecutionContext
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import schemas
+from app.core import settings
+from app.core.logger import pool_checkouts
+
+
+class PoolMetrics:
+    """Counters of a connection pool, updated by the pool and the engine events"""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.waits = 0  # Checkouts which found the pool exhausted
+        self.checkout_time = 0.0
+        self.checkout_time_max = 0.0
+
+        self.connects = 0
+        self.invalidations = 0
+
+        # SQLAlchemy compiled statement cache
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_checkout(self, duration: float, waited: bool) -> None:
+        self.checkouts += 1
+        self.waits += waited
+        self.checkout_time += duration
+        self.checkout_time_max = max(self.checkout_time_max, duration)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Connection pool which times the checkouts (waiting for a free connection,
+    connecting, pre-ping), both for the pool metrics and for the current request,
+    so that connection contention shows up per request
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self) -> "TimedQueuePool":
+        # Pool is re-created by `engine.dispose()`, the metrics are kept
+        pool = cast(TimedQueuePool, super().recreate())
+        pool.metrics = self.metrics
+        return pool
+
+    def connect(self) -> PoolProxiedConnection:
+        # Neither an idle connection nor room for a new one
+        waited = (
+            self.checkedin() == 0
+            and self.checkedout() >= self.size() + self._max_overflow
+        )
+
+        start_time = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            duration = time.perf_counter() - start_time
+            self.metrics.record_checkout(duration, waited)
+
+            checkouts = pool_checkouts.get()
+            if checkouts is not None:
+                checkouts.count += 1
+                checkouts.duration += duration
+
+    def get_metrics(self) -> schemas.DbPoolMetrics:
+        metrics = self.metrics
+
+        return schemas.DbPoolMetrics(
+            size=self.size(),
+            checkedOut=self.checkedout(),
+            idle=self.checkedin(),
+            overflow=max(self.overflow(), 0),
+            checkouts=metrics.checkouts,
+            waits=metrics.waits,
+            checkoutAvgMs=metrics.checkout_time / max(metrics.checkouts, 1) * 1000,
+            checkoutMaxMs=metrics.checkout_time_max * 1000,
+            connects=metrics.connects,
+            invalidations=metrics.invalidations,
+            statementCacheHits=metrics.cache_hits,
+            statementCacheMisses=metrics.cache_misses,
+        )
+
+
+def create_engine(url: str) -> AsyncEngine:
+    """Engine with the pool and driver settings, instrumented for the pool metrics"""
+
+    connect_args: dict[str, Any] = {
+        "prepared_statement_cache_size": settings.db_prepared_statement_cache_size,
+    }
+
+    if settings.db_pgbouncer:
+        connect_args.update(
+            prepared_statement_cache_size=0,
+            # Names must be unique across the server connections
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+            # Cache of asyncpg itself (used outside of SQLAlchemy's statements)
+            statement_cache_size=0,
+        )
+
+    engine = create_async_engine(
+        url,
+        echo=settings.debug,  # Enable SQL query logging if in debug mode
+        poolclass=TimedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        query_cache_size=settings.db_compiled_cache_size,
+        connect_args=connect_args,
+    )
+
+    instrument_engine(engine)
+    return engine
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+
+    def get_metrics() -> PoolMetrics:
+        # Looked up on every event, as the pool is re-created on dispose
+        pool = sync_engine.pool
+        assert isinstance(pool, TimedQueuePool)
+        return pool.metrics
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(*_args: Any) -> None:
+        get_metrics().connects += 1
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(*_args: Any) -> None:
+        get_metrics().invalidations += 1
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def on_execute(
+        _conn: Any,
+        _cursor: Any,
+        _statement: str,
+        _parameters: Any,
+        context: DefaultExecutionContext,
+        _executemany: bool,
+    ) -> None:
+        # Only the statements that can be cached (compiled from a construct)
+        if context.cache_hit == CacheStats.CACHE_HIT:
+            get_metrics().cache_hits += 1
+        elif context.cache_hit == CacheStats.CACHE_MISS:
+            get_metrics().cache_misses += 1
@@ -0,0 +1,147 @@
+import asyncio
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.engine.interfaces import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import Mapper, Session
+from sqlalchemy.sql import ClauseElement
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core import log
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine) -> None:
+        self.name = name
+        self.engine = engine
+        self.healthy = True
+
+        # A lost connection takes the replica out of the rotation right away, the
+        # health checks put it back once it's reachable again
+        @event.listens_for(engine.sync_engine, "handle_error")
+        def on_error(context: ExceptionContext) -> None:
+            if context.is_disconnect:
+                self.set_healthy(False, context.original_exception)
+
+    def set_healthy(self, healthy: bool, error: BaseException | None = None) -> None:
+        if healthy == self.healthy:
+            return
+
+        self.healthy = healthy
+        if healthy:
+            log.info("DB replica %s is healthy again", self.name)
+        else:
+            log.warning("DB replica %s is unhealthy: %s", self.name, error)
+
+    async def check_health(self, timeout: float) -> None:
+        try:
+            async with asyncio.timeout(timeout), self.engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception as e:
+            self.set_healthy(False, e)
+        else:
+            self.set_healthy(True)
+
+
+class ReplicaSet:
+    """Read replicas, handed out round-robin among the healthy ones"""
+
+    def __init__(self, replicas: list[Replica]) -> None:
+        self.replicas = replicas
+        self._next = 0
+
+    def __len__(self) -> int:
+        return len(self.replicas)
+
+    def choose(self) -> Replica | None:
+        """Next healthy replica, `None` if there are none (reads go to the primary)"""
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+
+        self._next = (self._next + 1) % len(healthy)
+        return healthy[self._next]
+
+    async def check_health(self, timeout: float) -> None:
+        await asyncio.gather(
+            *(replica.check_health(timeout) for replica in self.replicas)
+        )
+
+    async def dispose(self) -> None:
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+    Session which sends the statements of read-only units of work to a replica, and
+    everything else (writes, flushes) to the primary (the session's bind).
+
+    A replica is chosen by the first statement and kept for the whole session, so
+    that all of its reads see the same replica. A flush makes it a read-write unit
+    of work, the rest of the session is sent to the primary.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        replicas: ReplicaSet | None = None,
+        read_only: bool = False,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+        self.read_only = read_only
+        self.replica: Replica | None = None
+
+    def get_bind(
+        self,
+        mapper: type[Any] | Mapper[Any] | None = None,
+        *,
+        clause: ClauseElement | None = None,
+        bind: Engine | Connection | None = None,
+        **kwargs: Any,
+    ) -> Engine | Connection:
+        if (
+            bind is None
+            and self.read_only
+            and self.replicas
+            and not isinstance(clause, UpdateBase)
+        ):
+            if self.replica is None:
+                self.replica = self.replicas.choose()
+            if self.replica is not None:
+                return self.replica.engine.sync_engine
+
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+    def flush(self, objects: Sequence[Any] | None = None) -> None:
+        # Changes are written to the primary, and so is the rest of the session (the
+        # commit and the autoflush flush too, if there are changes)
+        self.read_only = False
+        super().flush(objects)
+
+
+class RoutingAsyncSession(AsyncSession):
+    sync_session_class = RoutingSession
+    sync_session: RoutingSession
+
+    @property
+    def on_replica(self) -> bool:
+        """Whether the statements so far were sent to a replica"""
+
+        return self.sync_session.replica is not None
+
+    async def use_primary(self) -> None:
+        """
+        End the current transaction and send the rest of the session to the primary,
+        e.g. to read rows that might not have been replicated yet
+        """
+
+        await self.rollback()
+        self.sync_session.read_only = False
+        self.sync_session.replica = None
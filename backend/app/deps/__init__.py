@@ -1,2 +1,3 @@
-from .db import db_dep  # isort: split
-from .auth import current_user_dep
+from .db import db_dep, read_db_dep  # isort: split
+from .auth import current_user_dep, metrics_auth
+from .upload import filter_uploads_dep, filter_uploads_openapi
@@ -1,24 +1,55 @@
+import secrets
 from typing import Annotated
 
 from fastapi import Depends, Request
 from fastapi.security import HTTPBearer
 
-from app import utils
-from app.core.exceptions import UnauthorizedError
-from app.db.models.user import User
-from app.deps import db_dep
+from app import schemas, utils
+from app.core import settings
+from app.core.exceptions import NotFoundError, UnauthorizedError
+from app.db.base import AsyncReadDbSession
 
 security = HTTPBearer()
 
 
-async def current_user(req: Request, db: db_dep) -> User:
+async def current_user(req: Request) -> schemas.UserPrincipal:
+    """
+    Authenticated user, looked up with a session of its own which is closed (and its
+    connection returned to the pool) right away. The handler's session (e.g. the
+    `db_dep` of the endpoints that write) isn't held along with it, nor is the
+    lookup's connection held while the handler runs, e.g. slow remote I/O like
+    storage uploads.
+    """
+
     access_token = req.headers.get("Authorization")
 
     if not isinstance(access_token, str):
         raise UnauthorizedError()
 
     access_token = access_token.replace("Bearer ", "")
-    return await utils.auth.decode_jwt_token(db, access_token, "access")
 
+    async with AsyncReadDbSession() as db:
+        try:
+            return await utils.auth.decode_jwt_token(db, access_token, "access")
+        except UnauthorizedError:
+            if not db.on_replica:
+                raise
+
+        # The user was looked up on a replica, a user who has just signed up might
+        # not have been replicated yet. The replica's connection is returned first
+        await db.use_primary()
+        return await utils.auth.decode_jwt_token(db, access_token, "access")
+
+
+current_user_dep = Annotated[schemas.UserPrincipal, Depends(current_user)]
 
-current_user_dep = Annotated[User, Depends(current_user)]
+
+async def metrics_auth(req: Request) -> None:
+    """Requests to the metrics must carry the metrics token (`METRICS_TOKEN`)"""
+
+    if not settings.metrics_token:
+        raise NotFoundError()
+
+    token = req.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not secrets.compare_digest(token.encode(), settings.metrics_token.encode()):
+        raise UnauthorizedError()
@@ -3,12 +3,26 @@ from typing import Annotated, AsyncGenerator
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.base import AsyncDbSession
+from app.db.base import AsyncDbSession, AsyncReadDbSession
+from app.db.routing import RoutingAsyncSession
 
 
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    # The session is lazy: a connection is only checked out of the pool by the first
+    # statement, and it's returned as soon as the transaction ends (commit or
+    # rollback). Requests that fail early (e.g. unauthorized) don't use the pool
     async with AsyncDbSession() as session:
         yield session
 
 
 db_dep = Annotated[AsyncSession, Depends(get_db)]
+
+
+async def get_read_db() -> AsyncGenerator[RoutingAsyncSession, None]:
+    # Read-only unit of work, sent to a replica (if any). Not for the endpoints that
+    # write, or read what the same client has just written
+    async with AsyncReadDbSession() as session:
+        yield session
+
+
+read_db_dep = Annotated[RoutingAsyncSession, Depends(get_read_db)]
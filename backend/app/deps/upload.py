@@ -0,0 +1,45 @@
+from typing import Annotated
+
+from fastapi import Depends, Request
+
+from app.core import settings
+from app.utils import FilterUpload, filter_storage
+from app.utils.upload_parser import StreamingUploadParser
+
+
+async def filter_uploads(req: Request) -> list[FilterUpload]:
+    """Style filter images of the `files` field, validated while being received"""
+
+    parser = StreamingUploadParser(
+        field_name="files",
+        supported_types=filter_storage.SUPPORTED_FILE_TYPE,
+        max_file_size=filter_storage.MAX_FILE_SIZE,
+        max_request_size=settings.upload_max_request_size,
+    )
+
+    return await parser.parse(req)
+
+
+filter_uploads_dep = Annotated[list[FilterUpload], Depends(filter_uploads)]
+
+# Request body of the endpoints using `filter_uploads_dep`, for the OpenAPI schema
+filter_uploads_openapi = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["files"],
+                    "properties": {
+                        "files": {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "description": "Filters to upload",
+                        },
+                    },
+                },
+            },
+        },
+    },
+}
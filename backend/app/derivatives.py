@@ -0,0 +1,77 @@
+"""
+Rendering of the image derivatives, run in the worker processes of the derivative
+pipeline (`app.utils.image_derivatives`). The processes are spawned and import this
+module to run it, hence it mustn't import anything from the rest of the app.
+"""
+
+import base64
+import io
+from dataclasses import dataclass
+
+from PIL import Image, ImageFilter, ImageOps
+from pillow_heif import register_heif_opener
+
+# HEIC/HEIF uploads (e.g. photos taken on iPhones) are decoded by `pillow-heif`
+register_heif_opener()
+
+# Name of the derivatives, stored next to the original as `<name>.<derivative>`
+BLUR_DERIVATIVE = "blur.jpg"
+SMALL_DERIVATIVE = "small.jpg"
+
+BLUR_WIDTH = 64  # Placeholder is upscaled (and blurred further) by the browser
+BLUR_RADIUS = 4
+SMALL_SIZE = (400, 280)
+
+# Tiny preview inlined in the API responses (as a data URL), so that the feed can
+# render placeholders without fetching the blurred image
+PLACEHOLDER_SIZE = (16, 16)
+
+
+@dataclass
+class Derivatives:
+    # Data URL of the tiny blurred preview
+    placeholder: str
+
+    # Encoded derivatives to be stored, by name (e.g. `small.jpg`)
+    files: dict[str, bytes]
+
+
+def render_derivatives(content: bytes, files: bool) -> Derivatives:
+    """
+    Decode the image once and render its derivatives: the inline placeholder and,
+    if `files` is set, the blur image and the 400x280 (crop to fill) thumbnail as
+    JPEG.
+
+    Runs in a worker process, hence it must be a module level function.
+    """
+
+    with Image.open(io.BytesIO(content)) as original:
+        img = ImageOps.exif_transpose(original).convert("RGB")
+
+    preview = img.copy()
+    preview.thumbnail(PLACEHOLDER_SIZE, Image.Resampling.BILINEAR)
+    preview = preview.filter(ImageFilter.GaussianBlur(1))
+    placeholder = base64.b64encode(_encode(preview, "WEBP", quality=40)).decode()
+
+    derivatives = Derivatives(f"data:image/webp;base64,{placeholder}", {})
+    if not files:
+        return derivatives
+
+    blur_height = max(1, round(img.height * BLUR_WIDTH / img.width))
+    blur = img.resize((BLUR_WIDTH, blur_height), Image.Resampling.BILINEAR)
+    blur = blur.filter(ImageFilter.GaussianBlur(BLUR_RADIUS))
+
+    small = ImageOps.fit(img, SMALL_SIZE, Image.Resampling.LANCZOS)
+
+    derivatives.files[BLUR_DERIVATIVE] = _encode(blur, "JPEG", quality=60)
+    derivatives.files[SMALL_DERIVATIVE] = _encode(
+        small, "JPEG", quality=85, optimize=True
+    )
+
+    return derivatives
+
+
+def _encode(img: Image.Image, fmt: str, **options: object) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, **options)
+    return buffer.getvalue()
@@ -1,25 +1,56 @@
-import time
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from asgi_correlation_id import CorrelationIdMiddleware
-from fastapi import FastAPI, Request, Response, status
-from fastapi.encoders import jsonable_encoder
+from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 
-from app.api import auth_router, style_filer_router
+from app.api import auth_router, metrics_router, style_filer_router
 from app.core import log, settings
 from app.core.exceptions import HttpError
+from app.core.middleware import ResponseHeadersMiddleware
+from app.core.responses import JsonResponse
+from app.crud.style_filter import feed_pages
+from app.db.base import replicas
 from app.utils.enums import HttpHeader
+from app.workers import replica_health_worker, storage_deletion_worker
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    # Background workers, running along with the app
+    tasks: list[asyncio.Task[None]] = []
+
+    if settings.storage_deletion_worker_enabled:
+        tasks.append(asyncio.create_task(storage_deletion_worker.run()))
+
+    if len(replicas) > 0:
+        tasks.append(asyncio.create_task(replica_health_worker.run()))
+
+    yield
+
+    for task in tasks:
+        task.cancel()
+
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Connections of the shared feed cache (Redis backend)
+    await feed_pages.close()
+
 
 app = FastAPI(
     title=settings.app_title,
     version=settings.app_version,
     docs_url="/api/docs",
+    lifespan=lifespan,
+    default_response_class=JsonResponse,
 )
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -31,6 +62,7 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(style_filer_router, prefix="/api/filter", tags=["Style Filter"])
+app.include_router(metrics_router, prefix="/api/metrics", tags=["Metrics"])
 
 
 # =========================
@@ -44,7 +76,11 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=[str(origin) for origin in settings.cors_origins],
     allow_credentials=True,  # Allow credentials (cookies, etc.)
-    expose_headers=[HttpHeader.REQUEST_ID.value, HttpHeader.PROCESS_TIME.value],
+    expose_headers=[
+        HttpHeader.REQUEST_ID.value,
+        HttpHeader.PROCESS_TIME.value,
+        HttpHeader.DB_CHECKOUT_TIME.value,
+    ],
 )
 
 # Compresses response data for faster transmission and smaller payloads
@@ -63,30 +99,9 @@ if settings.environment == "production":
     )
 
 
-# Custom middleware for adding security headers (optional)
-@app.middleware("http")
-async def add_security_headers(request, call_next):
-    response = await call_next(request)
-
-    # Prevent MIME type sniffing
-    response.headers["X-Content-Type-Options"] = "nosniff"
-
-    # Prevent Clickjacking
-    response.headers["X-Frame-Options"] = "DENY"
-
-    # Enable XSS protection in browsers
-    response.headers["X-XSS-Protection"] = "1; mode=block"
-
-    return response
-
-
-@app.middleware("http")
-async def add_process_time_header(req: Request, call_next) -> Response:
-    start_time = time.time()
-    response = await call_next(req)
-    process_time = time.time() - start_time
-    response.headers[HttpHeader.PROCESS_TIME.value] = str(process_time)
-    return response
+# Adds security headers and process time to responses. Added last so that it's the
+# outermost middleware and the process time covers the other middlewares too
+app.add_middleware(ResponseHeadersMiddleware)
 
 
 # =========================
@@ -95,46 +110,38 @@ async def add_process_time_header(req: Request, call_next) -> Response:
 
 
 @app.exception_handler(HttpError)
-async def http_err_handler(_: Request, e: HttpError) -> JSONResponse:
-    content = jsonable_encoder(
-        {
-            "reason": e.reason,
-            "message": e.message,
-            **(e.context if e.context else {}),
-        }
-    )
+async def http_err_handler(_: Request, e: HttpError) -> JsonResponse:
+    content = {
+        "reason": e.reason,
+        "message": e.message,
+        **(e.context if e.context else {}),
+    }
 
-    log.error(f"HTTP request error {e.status_code}: {content}")
-    return JSONResponse(status_code=e.status_code, headers=e.headers, content=content)
+    log.error("HTTP request error %s: %s", e.status_code, content)
+    return JsonResponse(status_code=e.status_code, headers=e.headers, content=content)
 
 
 @app.exception_handler(RequestValidationError)
-async def validation_err_handler(_: Request, e: RequestValidationError) -> JSONResponse:
-    return JSONResponse(
+async def validation_err_handler(_: Request, e: RequestValidationError) -> JsonResponse:
+    return JsonResponse(
         status_code=status.HTTP_400_BAD_REQUEST,
-        content=jsonable_encoder(
-            {
-                "reason": "Bad Request",
-                "message": "Validation Error",
-                "errors": e.errors(),
-            }
-        ),
+        content={
+            "reason": "Bad Request",
+            "message": "Validation Error",
+            "errors": e.errors(),
+        },
     )
 
 
 @app.exception_handler(Exception)
-async def global_err_handler(_: Request, e: Exception) -> JSONResponse:
-    content = jsonable_encoder(
-        {
+async def global_err_handler(_: Request, e: Exception) -> JsonResponse:
+    log.error("Unhandled exception: %s", e)
+    return JsonResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={
             "reason": "Unhandled Exceptions",
             "message": "Internal Server Error",
-        }
-    )
-
-    log.error(f"Unhandled exception: {e}")
-    return JSONResponse(
-        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content=content,
+        },
     )
 
 
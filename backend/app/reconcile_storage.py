@@ -0,0 +1,196 @@
+"""
+This is a script that reconciles the style filter images in the storage with the
+`style_filters` table:
+
+- images in the storage which no style filter references (orphans, e.g. left behind
+  by a failed upload rollback) are deleted,
+- style filters which reference images missing from the storage (dangling) are
+  reported.
+
+Exits with a non-zero status if there are dangling style filters, or orphans which
+couldn't be deleted.
+
+Both sides are paged through (storage listing, server-side cursor over
+`style_filters.img_id`), hence the memory use is bounded by the page size. Images
+newer than the grace period are skipped, so that uploads in progress (stored, but
+not inserted yet) aren't taken as orphans.
+
+Usage: python -m app.reconcile_storage [--dry-run] [--grace-period SECONDS]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+
+from sqlalchemy import select
+
+from app import crud
+from app.core import log
+from app.db.base import AsyncDbSession, engine
+from app.db.models import StyleFilter
+from app.utils import filter_storage
+
+DEFAULT_PAGE_SIZE = 500
+DEFAULT_GRACE_PERIOD = 60 * 60
+DELETE_BATCH_SIZE = 100
+
+
+@dataclass
+class ReconciliationReport:
+    images_listed: int = 0
+    images_skipped: int = 0
+    orphans: int = 0
+    orphans_deleted: int = 0
+    orphans_failed: int = 0
+    rows_checked: int = 0
+    dangling: int = 0
+    images_elapsed: float = 0
+    rows_elapsed: float = 0
+
+    @property
+    def has_problems(self) -> bool:
+        """Dangling style filters, or orphans which couldn't be deleted"""
+
+        return self.dangling > 0 or self.orphans_failed > 0
+
+    def log(self, dry_run: bool) -> None:
+        images_rate = self.images_listed / max(self.images_elapsed, 1e-9)
+        rows_rate = self.rows_checked / max(self.rows_elapsed, 1e-9)
+
+        log.info(
+            "Storage: %s images listed in %.2fs (%.0f images/s), %s skipped (grace "
+            "period), %s orphans, %s deleted, %s failed%s",
+            self.images_listed,
+            self.images_elapsed,
+            images_rate,
+            self.images_skipped,
+            self.orphans,
+            self.orphans_deleted,
+            self.orphans_failed,
+            " (dry run)" if dry_run else "",
+        )
+        log.info(
+            "Database: %s images checked in %.2fs (%.0f images/s), %s dangling",
+            self.rows_checked,
+            self.rows_elapsed,
+            rows_rate,
+            self.dangling,
+        )
+
+
+async def delete_orphans(
+    report: ReconciliationReport,
+    *,
+    page_size: int,
+    grace_period: timedelta,
+    dry_run: bool,
+) -> None:
+    """Delete the stored images that no style filter references"""
+
+    started_at = time.perf_counter()
+    created_before = datetime.now(UTC) - grace_period
+    pages = filter_storage.backend.list_images(page_size)
+
+    async with AsyncDbSession() as db:
+        # Listing calls the storage service (blocking), hence it's run in a thread
+        while (page := await asyncio.to_thread(next, pages, None)) is not None:
+            report.images_listed += len(page)
+
+            img_ids = {img.img_id for img in page if img.created_at < created_before}
+            report.images_skipped += len(page) - len(img_ids)
+
+            orphans = sorted(
+                await crud.style_filter.get_unreferenced_img_ids(db, img_ids)
+            )
+            report.orphans += len(orphans)
+
+            # Don't keep the transaction (snapshot) open while deleting
+            await db.rollback()
+
+            for i in range(0, len(orphans), DELETE_BATCH_SIZE):
+                batch = set(orphans[i : i + DELETE_BATCH_SIZE])
+
+                if dry_run:
+                    log.info("Would delete orphaned images %s", batch)
+                    continue
+
+                try:
+                    await filter_storage.delete_many(batch)
+                except Exception as e:
+                    # Other batches might still succeed, these are retried next run
+                    log.error("Failed to delete orphaned images %s: %s", batch, e)
+                    report.orphans_failed += len(batch)
+                else:
+                    report.orphans_deleted += len(batch)
+
+    report.images_elapsed = time.perf_counter() - started_at
+
+
+async def find_dangling(report: ReconciliationReport, *, page_size: int) -> None:
+    """Find the images referenced by style filters which are missing from storage"""
+
+    started_at = time.perf_counter()
+
+    async with AsyncDbSession() as db:
+        img_ids = await db.stream_scalars(
+            select(StyleFilter.img_id)
+            .where(StyleFilter.img_id.is_not(None))
+            .distinct()
+            .execution_options(yield_per=page_size)
+        )
+
+        async for page in img_ids.partitions(page_size):
+            batch = [img_id for img_id in page if img_id is not None]
+            report.rows_checked += len(batch)
+
+            existing = await asyncio.to_thread(
+                filter_storage.backend.get_existing, batch
+            )
+            dangling = [img_id for img_id in batch if img_id not in existing]
+
+            if dangling:
+                log.warning("Style filters reference missing images %s", dangling)
+                report.dangling += len(dangling)
+
+    report.rows_elapsed = time.perf_counter() - started_at
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only report the orphaned images, don't delete them",
+    )
+    parser.add_argument(
+        "--grace-period",
+        type=int,
+        default=DEFAULT_GRACE_PERIOD,
+        help="Skip images stored less than this many seconds ago",
+    )
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    report = ReconciliationReport()
+
+    log.info("Reconciling the stored images with the style filters")
+    await delete_orphans(
+        report,
+        page_size=args.page_size,
+        grace_period=timedelta(seconds=args.grace_period),
+        dry_run=args.dry_run,
+    )
+    await find_dangling(report, page_size=args.page_size)
+    report.log(args.dry_run)
+
+    # Connections are bound to the event loop, which is closed once this returns
+    await engine.dispose()
+
+    return 1 if report.has_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -1,6 +1,18 @@
+from .metrics import (
+    CacheMetrics,
+    DbPoolMetrics,
+    LoggerMetrics,
+    StorageDeletionMetrics,
+    UploadEngineMetrics,
+)
 from .style_filter import StyleFilter
 
 from .user import User  # isort: split
 from . import http
-from .auth import AuthToken
-from .query import GetStyleFiltersQuery, ReportStyleFilterQuery, StyleFilterDeleteQuery
+from .auth import AuthToken, UserPrincipal
+from .query import (
+    GetStyleFiltersQuery,
+    ReportStyleFilterQuery,
+    StyleFilterCursor,
+    StyleFilterDeleteQuery,
+)
@@ -1,7 +1,35 @@
 from uuid import UUID
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
+
+from app.schemas.user import User
 
 
 class AuthToken(BaseModel):
     user_id: UUID
+
+
+class UserPrincipal(BaseModel):
+    """
+    Lightweight, read-only snapshot of the authenticated user. Unlike the `User`
+    model, it isn't bound to a DB session and hence can be cached across requests.
+    """
+
+    model_config = ConfigDict(frozen=True, from_attributes=True)
+
+    id: int
+    public_user_id: UUID
+    username: str
+    email: str
+    profile_pic_url: str
+    is_active: bool
+    is_banned: bool
+
+    def to_schema(self) -> User:
+        # Values were validated when the user was created
+        return User.model_construct(
+            user_id=self.public_user_id,
+            profile_pic_url=self.profile_pic_url,
+            email=self.email,
+            username=self.username,
+        )
@@ -17,6 +17,7 @@ from .auth import (
     LoggedInUserProfile,
     RefreshAccessTokenOut,
 )
+from .metrics import MetricsOut
 from .style_filter import (
     GetStyleFiltersOut,
     ReportStyleFilterOut,
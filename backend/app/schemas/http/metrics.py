@@ -0,0 +1,24 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+from app.schemas import (
+    CacheMetrics,
+    DbPoolMetrics,
+    LoggerMetrics,
+    StorageDeletionMetrics,
+    UploadEngineMetrics,
+)
+
+# =============================
+# Metrics
+# =============================
+
+
+class MetricsOut(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    uploads: UploadEngineMetrics
+    caches: dict[str, CacheMetrics]
+    logs: LoggerMetrics
+    db: DbPoolMetrics
+    # Pools of the read replicas, by name
+    replicas: dict[str, DbPoolMetrics]
+    storage_deletions: StorageDeletionMetrics = Field(..., alias="storageDeletions")
@@ -30,4 +30,12 @@ class ReportStyleFilterOut(BaseModel):
 
 
 class GetStyleFiltersOut(UploadStyleFiltersOut):
-    total: int = Field(..., ge=0)
+    # Unlike upload, a page can be empty (e.g. the one after the last page)
+    filters: list[StyleFilter]
+
+    # Total number of style filters in the feed (`None` if not requested). It can
+    # be slightly stale or approximate as it's cached
+    total: int | None = Field(..., ge=0)
+
+    # Cursor for the next page, `None` when there're no more style filters
+    next_cursor: str | None = Field(None, alias="nextCursor")
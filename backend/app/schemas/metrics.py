@@ -0,0 +1,69 @@
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class UploadEngineMetrics(BaseModel):
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    # Uploads waiting for a free slot and uploads currently running
+    queue_depth: int = Field(..., alias="queueDepth", ge=0)
+    in_flight: int = Field(..., alias="inFlight", ge=0)
+
+    completed: int = Field(..., ge=0)
+    failed: int = Field(..., ge=0)
+
+    # Latency of a single upload (in milliseconds)
+    latency_avg_ms: float = Field(..., alias="latencyAvgMs", ge=0)
+    latency_max_ms: float = Field(..., alias="latencyMaxMs", ge=0)
+    latency_last_ms: float = Field(..., alias="latencyLastMs", ge=0)
+
+
+class CacheMetrics(BaseModel):
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    size: int = Field(..., ge=0)
+    max_size: int = Field(..., alias="maxSize", ge=0)
+    hits: int = Field(..., ge=0)
+    misses: int = Field(..., ge=0)
+
+
+class LoggerMetrics(BaseModel):
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    # Log records waiting to be written and records dropped as the queue was full
+    queued: int = Field(..., ge=0)
+    dropped: int = Field(..., ge=0)
+
+
+class StorageDeletionMetrics(BaseModel):
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    # Images deleted from the storage, and queued deletions which failed (retried
+    # later with backoff)
+    deleted: int = Field(..., ge=0)
+    failed: int = Field(..., ge=0)
+
+
+class DbPoolMetrics(BaseModel):
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+    # Connections kept open, in use, idle and opened above the pool size
+    size: int = Field(..., ge=0)
+    checked_out: int = Field(..., alias="checkedOut", ge=0)
+    idle: int = Field(..., ge=0)
+    overflow: int = Field(..., ge=0)
+
+    # Checkouts, and those which found the pool exhausted (waited for a connection)
+    checkouts: int = Field(..., ge=0)
+    waits: int = Field(..., ge=0)
+
+    # Duration of a checkout (in milliseconds)
+    checkout_avg_ms: float = Field(..., alias="checkoutAvgMs", ge=0)
+    checkout_max_ms: float = Field(..., alias="checkoutMaxMs", ge=0)
+
+    # Connections opened, and invalidated (e.g. failed pre-ping, disconnect)
+    connects: int = Field(..., ge=0)
+    invalidations: int = Field(..., ge=0)
+
+    # SQLAlchemy compiled statement cache
+    statement_cache_hits: int = Field(..., alias="statementCacheHits", ge=0)
+    statement_cache_misses: int = Field(..., alias="statementCacheMisses", ge=0)
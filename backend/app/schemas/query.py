@@ -1,7 +1,10 @@
-from typing import Literal
+import base64
+import binascii
+from datetime import datetime
+from typing import Literal, Self
 from uuid import UUID
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError, model_validator
 
 
 class StyleFilterDeleteQuery(BaseModel):
@@ -14,8 +17,52 @@ class ReportStyleFilterQuery(BaseModel):
     type: Literal["increment", "decrement"]
 
 
+class StyleFilterCursor(BaseModel):
+    """
+    Position of the last style filter of a page in the feed, which is ordered by
+    `(created_at, id)`. It's sent to the client as an opaque string.
+    """
+
+    model_config = {"extra": "forbid"}
+    created_at: datetime
+    id: int
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(self.model_dump_json().encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> "StyleFilterCursor":
+        try:
+            return cls.model_validate_json(base64.urlsafe_b64decode(cursor))
+        except (binascii.Error, ValidationError) as e:
+            raise ValueError("Invalid cursor") from e
+
+
 class GetStyleFiltersQuery(BaseModel):
     model_config = {"extra": "forbid", "populate_by_name": True}
     limit: int = Field(20, ge=0, le=100)
     offset: int = Field(0, ge=0)
     author_id: UUID | None = Field(None, alias="authorId")
+
+    # Cursor (`nextCursor` of the previous page) for keyset pagination. This is
+    # preferred over `offset` as it doesn't slow down on deep pages and doesn't
+    # skip/repeat filters when new ones are uploaded
+    cursor: str | None = None
+
+    # Total is costly for large feeds, so clients that don't need it can skip it
+    include_total: bool = Field(True, alias="includeTotal")
+
+    # Decoded `cursor`, decoded once while the query is validated
+    _decoded_cursor: StyleFilterCursor | None = PrivateAttr(None)
+
+    @model_validator(mode="after")
+    def validate_pagination(self) -> Self:
+        if self.cursor is not None:
+            if self.offset != 0:
+                raise ValueError("Either offset or cursor can be used, not both")
+            self._decoded_cursor = StyleFilterCursor.decode(self.cursor)
+        return self
+
+    @property
+    def decoded_cursor(self) -> StyleFilterCursor | None:
+        return self._decoded_cursor
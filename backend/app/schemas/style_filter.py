@@ -1,4 +1,6 @@
-from pydantic import UUID4, AnyHttpUrl, BaseModel, ConfigDict, Field
+from pydantic import UUID4, BaseModel, ConfigDict, Field
+
+from .types import TrustedHttpUrl
 
 
 class StyleFilter(BaseModel):
@@ -12,9 +14,10 @@ class StyleFilter(BaseModel):
     author_id: UUID4 = Field(..., alias="authorId")
 
     img_id: str = Field(..., alias="imgId")
-    img_url: AnyHttpUrl = Field(..., alias="imgURL")
-    blur_img_url: AnyHttpUrl = Field(..., alias="blurImgURL")
-    small_img_url: AnyHttpUrl = Field(..., alias="smallImgURL")
+    img_url: TrustedHttpUrl = Field(..., alias="imgURL")
+    blur_img_url: TrustedHttpUrl = Field(..., alias="blurImgURL")
+    small_img_url: TrustedHttpUrl = Field(..., alias="smallImgURL")
+    blur_data_url: str | None = Field(None, alias="blurDataURL")
 
     is_official: bool = Field(..., alias="isOfficial")
     is_banned: bool = Field(..., alias="isBanned")
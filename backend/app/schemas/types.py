@@ -0,0 +1,8 @@
+from typing import Annotated
+
+from pydantic import AnyHttpUrl, PlainSerializer
+
+# URL which is validated as `AnyHttpUrl`, but serialized with `str`. Hence, a schema
+# built from trusted values (e.g. read from the DB) with `model_construct`, which
+# skips the validation, can hold it as a plain string
+TrustedHttpUrl = Annotated[AnyHttpUrl, PlainSerializer(str, return_type=str)]
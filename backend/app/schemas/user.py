@@ -1,4 +1,6 @@
-from pydantic import UUID4, AnyHttpUrl, BaseModel, ConfigDict, EmailStr, Field
+from pydantic import UUID4, BaseModel, ConfigDict, EmailStr, Field
+
+from .types import TrustedHttpUrl
 
 
 class User(BaseModel):
@@ -11,4 +13,4 @@ class User(BaseModel):
     user_id: UUID4 = Field(..., alias="userId")
     username: str = Field(..., min_length=3, max_length=255)
     email: EmailStr
-    profile_pic_url: AnyHttpUrl = Field(..., alias="profilePicURL")
+    profile_pic_url: TrustedHttpUrl = Field(..., alias="profilePicURL")
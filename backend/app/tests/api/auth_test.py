@@ -0,0 +1,107 @@
+from uuid import UUID
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app import crud, schemas
+from app.crud.user import user_principals
+from app.db.base import AsyncReadDbSession
+from app.db.models import User
+from app.db.routing import RoutingAsyncSession
+from app.tests.conftest import QueryCounter, SeededAuthor, portal
+from app.utils.enums import HttpHeader
+
+
+def test_unauthorized_request_does_not_check_out_connection(client: TestClient) -> None:
+    response = client.get("/api/auth/me", headers={"Authorization": "Bearer invalid"})
+
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert float(response.headers[HttpHeader.DB_CHECKOUT_TIME.value]) == 0
+
+
+def test_authorized_request_reports_connection_checkout(
+    client: TestClient,
+    author: SeededAuthor,
+) -> None:
+    response = client.get(
+        "/api/auth/me",
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert float(response.headers[HttpHeader.DB_CHECKOUT_TIME.value]) > 0
+
+
+def test_current_user_falls_back_to_primary(
+    client: TestClient,
+    queries: QueryCounter,
+    replica_queries: QueryCounter,
+    author: SeededAuthor,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    get_principal = crud.user.get_principal
+
+    async def get_principal_not_replicated(
+        db: RoutingAsyncSession,
+        public_user_id: UUID,
+    ) -> schemas.UserPrincipal | None:
+        principal = await get_principal(db, public_user_id)
+
+        # As if the user had just signed up and wasn't replicated yet
+        return None if db.on_replica else principal
+
+    monkeypatch.setattr(crud.user, "get_principal", get_principal_not_replicated)
+
+    response = client.get(
+        "/api/auth/me",
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(replica_queries.statements) == 1
+    assert len(queries.statements) == 1
+
+
+def test_current_user_read_on_replica_is_cached(
+    client: TestClient,
+    replica_queries: QueryCounter,
+    author: SeededAuthor,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(user_principals, "enabled", True)
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+
+    response = client.get("/api/auth/me", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(replica_queries.statements) == 1
+    assert user_principals.get(author.public_user_id) is not None
+
+    response = client.get("/api/auth/me", headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(replica_queries.statements) == 1
+
+
+def test_read_session_flushes_to_primary(
+    client: TestClient,
+    queries: QueryCounter,
+    replica_queries: QueryCounter,
+) -> None:
+    async def flush() -> None:
+        async with AsyncReadDbSession() as db:
+            db.add(
+                User(
+                    username="flushed",
+                    email="flushed@example.com",
+                    profile_pic_url="http://localhost:8000/static/images/flushed.jpg",
+                )
+            )
+            await db.flush()
+            await db.rollback()
+
+    portal(client).call(flush)
+
+    assert len(replica_queries.statements) == 0
+    assert any(stmt.startswith("INSERT INTO users") for stmt in queries.statements)
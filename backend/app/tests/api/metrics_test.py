@@ -0,0 +1,88 @@
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core import settings
+from app.db.base import engine
+from app.tests.conftest import QueryCounter, SeededAuthor, portal
+
+
+def test_get_metrics_reports_db_pool(
+    client: TestClient,
+    author: SeededAuthor,
+    metrics_headers: dict[str, str],
+) -> None:
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    before = metrics["db"]
+
+    response = client.get(
+        "/api/auth/me",
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    after = metrics["db"]
+
+    assert after["checkouts"] > before["checkouts"]
+    assert after["checkedOut"] == 0
+    assert after["statementCacheHits"] + after["statementCacheMisses"] > (
+        before["statementCacheHits"] + before["statementCacheMisses"]
+    )
+
+
+def test_get_metrics_reports_replica_pools(
+    client: TestClient,
+    replica_queries: QueryCounter,
+    author: SeededAuthor,
+    metrics_headers: dict[str, str],
+) -> None:
+    response = client.get(
+        "/api/filter",
+        params={"limit": 1, "authorId": str(author.public_user_id)},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(replica_queries.statements) > 0
+
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    replica = metrics["replicas"]["test"]
+    assert replica["checkouts"] > 0
+    assert replica["checkedOut"] == 0
+
+
+def test_get_metrics_keeps_db_pool_counters_on_dispose(
+    client: TestClient,
+    author: SeededAuthor,
+    metrics_headers: dict[str, str],
+) -> None:
+    client.get(
+        "/api/auth/me",
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    before = metrics["db"]
+
+    # Pool is re-created by the dispose, the counters are kept
+    portal(client).call(engine.dispose)
+
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    after = metrics["db"]
+    assert after["checkouts"] == before["checkouts"]
+    assert after["connects"] == before["connects"]
+
+
+def test_get_metrics_requires_token(
+    client: TestClient,
+    metrics_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    response = client.get("/api/metrics")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = client.get("/api/metrics", headers={"Authorization": "Bearer wrong"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    # Disabled without a token
+    monkeypatch.setattr(settings, "metrics_token", None)
+    response = client.get("/api/metrics", headers=metrics_headers)
+    assert response.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,717 @@
+import io
+import warnings
+from types import SimpleNamespace
+from typing import Any
+from uuid import UUID
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import crud, schemas
+from app.db.base import AsyncDbSession, engine
+from app.db.models import StyleFilter
+from app.tests.conftest import (
+    QueryCounter,
+    SeededAuthor,
+    checked_out_connections,
+    make_png,
+    portal,
+)
+from app.utils import filter_storage, storage_backends
+from app.utils.image_derivatives import DerivativePipeline
+from app.utils.response_cache import ResponseCache
+from app.utils.storage_backends import (
+    CloudinaryStorageBackend,
+    LocalStorageBackend,
+    StoredImage,
+)
+from app.workers import storage_deletion_worker
+
+PAGE_SIZE = 10
+FEED_LIMIT = 100  # Max page size
+
+
+def test_get_style_filters_queries(
+    client: TestClient,
+    queries: QueryCounter,
+    author: SeededAuthor,
+) -> None:
+    response = client.get("/api/filter", params={"limit": PAGE_SIZE})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["filters"]) == PAGE_SIZE
+
+    # Page (with authors joined in) and the total
+    assert len(queries.statements) == 1 + 1
+    assert queries.total_rows == PAGE_SIZE + 1
+
+
+def test_get_style_filters_reads_from_replica(
+    client: TestClient,
+    queries: QueryCounter,
+    replica_queries: QueryCounter,
+    author: SeededAuthor,
+) -> None:
+    response = client.get("/api/filter", params={"limit": PAGE_SIZE})
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["filters"]) == PAGE_SIZE
+
+    assert len(queries.statements) == 0
+    assert len(replica_queries.statements) == 1 + 1
+
+
+def test_get_style_filters_cached(
+    client: TestClient,
+    queries: QueryCounter,
+    feed_cache: ResponseCache,
+    author: SeededAuthor,
+) -> None:
+    response = client.get("/api/filter", params={"limit": PAGE_SIZE})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries.statements) == 1 + 1
+    queries.reset()
+
+    cached = client.get("/api/filter", params={"limit": PAGE_SIZE})
+
+    assert cached.status_code == status.HTTP_200_OK
+    assert cached.json() == response.json()
+    assert len(queries.statements) == 0
+    assert feed_cache.hits == 1
+
+
+def test_get_style_filters_cached_page_reads_from_primary(
+    client: TestClient,
+    queries: QueryCounter,
+    replica_queries: QueryCounter,
+    feed_cache: ResponseCache,
+    author: SeededAuthor,
+) -> None:
+    response = client.get("/api/filter", params={"limit": PAGE_SIZE})
+    assert response.status_code == status.HTTP_200_OK
+
+    # Cached pages mustn't be older than their tags, which replicas can't ensure
+    assert len(replica_queries.statements) == 0
+    assert len(queries.statements) == 1 + 1
+    queries.reset()
+
+    # Pages which aren't cached are still read from the replica
+    response = client.get(
+        "/api/filter",
+        params={"limit": PAGE_SIZE, "authorId": str(author.public_user_id)},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert len(queries.statements) == 0
+    assert len(replica_queries.statements) == 1 + 1
+
+
+def test_get_style_filters_cache_invalidated_by_report(
+    client: TestClient,
+    queries: QueryCounter,
+    feed_cache: ResponseCache,
+    author: SeededAuthor,
+) -> None:
+    first_page = client.get("/api/filter", params={"limit": PAGE_SIZE}).json()
+    client.get("/api/filter", params={"limit": PAGE_SIZE, "offset": PAGE_SIZE})
+
+    filter_id = first_page["filters"][0]["filterId"]
+    response = client.patch(
+        f"/api/filter/{filter_id}/report",
+        params={"type": "increment"},
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+    queries.reset()
+
+    # Only the page with the reported filter is stale (the total hasn't changed)
+    response = client.get("/api/filter", params={"limit": PAGE_SIZE})
+    assert response.json()["filters"][0]["reportCount"] == 1
+    assert len(queries.statements) == 1
+    queries.reset()
+
+    client.get("/api/filter", params={"limit": PAGE_SIZE, "offset": PAGE_SIZE})
+    assert len(queries.statements) == 0
+
+
+def test_get_style_filters_cache_invalidated_by_delete(
+    client: TestClient,
+    feed_cache: ResponseCache,
+    author: SeededAuthor,
+) -> None:
+    first_page = client.get("/api/filter", params={"limit": PAGE_SIZE}).json()
+
+    filter_id = first_page["filters"][0]["filterId"]
+    response = client.delete(
+        "/api/filter",
+        params={"filterId": [filter_id]},
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    response = client.get("/api/filter", params={"limit": PAGE_SIZE})
+    assert filter_id not in {f["filterId"] for f in response.json()["filters"]}
+
+
+def test_get_style_filters_response_is_valid(
+    client: TestClient,
+    author: SeededAuthor,
+) -> None:
+    # Schemas are built without validation, serializing them mustn't warn about
+    # unexpected types
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+
+        response = client.get(
+            "/api/filter",
+            params={"limit": PAGE_SIZE, "authorId": str(author.public_user_id)},
+        )
+
+    assert response.status_code == status.HTTP_200_OK
+
+    filters = response.json()["filters"]
+    assert len(filters) == PAGE_SIZE
+    for filter in filters:
+        style_filter = schemas.StyleFilter.model_validate(filter)
+        assert style_filter.author_id == author.public_user_id
+
+
+def test_get_style_filters_skips_filters_without_author(
+    client: TestClient,
+    author: SeededAuthor,
+) -> None:
+    # Newest filter, whose author was deleted
+    async def insert_filter() -> int:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                insert(StyleFilter)
+                .values(
+                    base_img_url="http://localhost:8000/orphan.png",
+                    blur_img_url="http://localhost:8000/orphan-blur.png",
+                    small_img_url="http://localhost:8000/orphan-small.png",
+                    img_id=f"test-orphan-{author.id}",
+                    author_id=None,
+                )
+                .returning(StyleFilter.id)
+            )
+            return result.scalar_one()
+
+    async def delete_filter(filter_id: int) -> None:
+        async with engine.begin() as conn:
+            await conn.execute(delete(StyleFilter).where(StyleFilter.id == filter_id))
+
+    filter_id = portal(client).call(insert_filter)
+    try:
+        pages = [client.get("/api/filter", params={"limit": FEED_LIMIT}).json()]
+        while pages[-1]["nextCursor"] is not None:
+            params = {"limit": FEED_LIMIT, "cursor": pages[-1]["nextCursor"]}
+            pages.append(client.get("/api/filter", params=params).json())
+    finally:
+        portal(client).call(delete_filter, filter_id)
+
+    filters = [filter for page in pages for filter in page["filters"]]
+    for filter in filters:
+        schemas.StyleFilter.model_validate(filter)
+
+    # Total doesn't count them either
+    assert pages[0]["total"] == len(filters)
+
+
+def test_get_style_filters_rejects_invalid_cursor(client: TestClient) -> None:
+    response = client.get("/api/filter", params={"cursor": "invalid"})
+
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert "Invalid cursor" in response.json()["errors"][0]["msg"]
+
+
+def test_get_author_style_filters_without_total_queries(
+    client: TestClient,
+    queries: QueryCounter,
+    author: SeededAuthor,
+) -> None:
+    response = client.get(
+        "/api/filter",
+        params={
+            "limit": PAGE_SIZE,
+            "authorId": str(author.public_user_id),
+            "includeTotal": False,
+        },
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["filters"]) == PAGE_SIZE
+
+    assert len(queries.statements) == 1
+    assert queries.total_rows == PAGE_SIZE
+
+
+def test_get_logged_in_user_profile_queries(
+    client: TestClient,
+    queries: QueryCounter,
+    author: SeededAuthor,
+) -> None:
+    response = client.get(
+        "/api/auth/me",
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_200_OK
+
+    # Only the user, none of its style filters
+    assert len(queries.statements) == 1
+    assert queries.total_rows == 1
+    assert "style_filters" not in queries.statements[0]
+
+
+def test_upload_style_filters_queries(
+    client: TestClient,
+    queries: QueryCounter,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> None:
+    response = client.post(
+        "/api/filter",
+        files=[
+            ("files", (f"{i}.png", make_png(i), "image/png")) for i in range(PAGE_SIZE)
+        ],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len(response.json()["filters"]) == PAGE_SIZE
+
+    # User, already stored images (deduplication), images queued for deletion and a
+    # single insert of all filters
+    inserts = [stmt for stmt in queries.statements if stmt.startswith("INSERT")]
+    assert len(inserts) == 1
+    assert len(queries.statements) == 1 + 1 + 1 + 1
+
+
+def test_upload_style_filters_releases_db_connection(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    checked_out: list[int] = []
+    upload = local_storage.upload
+
+    def upload_and_check(*args: Any, **kwargs: Any) -> StoredImage:
+        checked_out.append(checked_out_connections())
+        return upload(*args, **kwargs)
+
+    monkeypatch.setattr(local_storage, "upload", upload_and_check)
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", (f"{i}.png", make_png(i), "image/png")) for i in range(2)],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+
+    # No connection is held by the request while the images are being stored
+    assert checked_out == [0, 0]
+
+
+def test_upload_style_filters_reuses_stored_image(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+    png = make_png(20_000)
+
+    response = client.post(
+        "/api/filter", files=[("files", ("0.png", png, "image/png"))], headers=headers
+    )
+    stored = response.json()["filters"][0]
+
+    uploads: list[StoredImage] = []
+    upload = local_storage.upload
+
+    def upload_and_record(*args: Any, **kwargs: Any) -> StoredImage:
+        uploads.append(upload(*args, **kwargs))
+        return uploads[-1]
+
+    monkeypatch.setattr(local_storage, "upload", upload_and_record)
+
+    response = client.post(
+        "/api/filter", files=[("files", ("1.png", png, "image/png"))], headers=headers
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    reused = response.json()["filters"][0]
+
+    # New style filter of the same image, which isn't uploaded again
+    assert reused["filterId"] != stored["filterId"]
+    assert reused["imgId"] == stored["imgId"]
+    assert uploads == []
+
+
+def test_upload_style_filters_conflicts_with_deleted_image(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+    png = make_png(20_002)
+
+    response = client.post(
+        "/api/filter", files=[("files", ("0.png", png, "image/png"))], headers=headers
+    )
+    stored = response.json()["filters"][0]
+    image = local_storage.root / stored["imgId"]
+
+    upload_many = filter_storage.upload_many
+
+    async def delete_and_upload_many(files: list[Any]) -> list[Any]:
+        # The only style filter using the reused image is deleted while uploading
+        async with AsyncDbSession() as db:
+            result = await db.execute(
+                select(StyleFilter.id).where(
+                    StyleFilter.public_filter_id == UUID(stored["filterId"])
+                )
+            )
+            filter_id = result.scalar_one()
+            await crud.style_filter.delete_many(db, [filter_id])
+
+        return await upload_many(files)
+
+    monkeypatch.setattr(filter_storage, "upload_many", delete_and_upload_many)
+
+    response = client.post(
+        "/api/filter", files=[("files", ("1.png", png, "image/png"))], headers=headers
+    )
+    assert response.status_code == status.HTTP_409_CONFLICT
+
+    portal(client).call(storage_deletion_worker.drain_batch)
+    assert not image.exists()
+
+    # Stored again once it's deleted
+    monkeypatch.setattr(filter_storage, "upload_many", upload_many)
+
+    response = client.post(
+        "/api/filter", files=[("files", ("1.png", png, "image/png"))], headers=headers
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    assert image.exists()
+
+
+def test_upload_style_filters_failure_keeps_image_of_concurrent_upload(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+    create_many = crud.style_filter.create_many
+
+    async def create_concurrently_and_fail(*args: Any) -> list[StyleFilter]:
+        # Same image is stored by a concurrent upload, which is committed first
+        async with AsyncDbSession() as db:
+            await create_many(db, *args[1:])
+
+        raise SQLAlchemyError("Insert failed")
+
+    monkeypatch.setattr(crud.style_filter, "create_many", create_concurrently_and_fail)
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("0.png", make_png(20_003), "image/png"))],
+        headers=headers,
+    )
+    assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    response = client.get(
+        "/api/filter",
+        params={"limit": 1, "authorId": str(author.public_user_id)},
+    )
+    image = local_storage.root / response.json()["filters"][0]["imgId"]
+
+    # Image of the failed upload is queued for deletion, but still in use
+    portal(client).call(storage_deletion_worker.drain_batch)
+    assert image.exists()
+
+
+def test_upload_style_filters_rejects_large_file(
+    client: TestClient,
+    author: SeededAuthor,
+) -> None:
+    png = b"\x89PNG\r\n\x1a\n" + b"\0" * (5 * 1024 * 1024)
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("large.png", png, "image/png"))],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+
+def test_upload_style_filters_rejects_invalid_image(
+    client: TestClient,
+    author: SeededAuthor,
+) -> None:
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("fake.png", b"<html></html>", "image/png"))],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+def test_upload_style_filters_without_placeholder(
+    client: TestClient,
+    author: SeededAuthor,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    backend = CloudinaryStorageBackend(DerivativePipeline(max_workers=1, files=False))
+    monkeypatch.setattr(filter_storage, "backend", backend)
+
+    uploaded: list[bytes] = []
+
+    def upload_image(file: Any, **_kwargs: Any) -> SimpleNamespace:
+        uploaded.append(file.read())
+        return SimpleNamespace(
+            public_id="style-filters/heic",
+            url="https://res.cloudinary.com/x/image/upload/style-filters/heic",
+        )
+
+    monkeypatch.setattr(storage_backends, "upload_image", upload_image)
+
+    # Accepted as HEIC, but it's truncated and can't be decoded
+    heic = b"\0\0\0\x18ftypheic\0\0\0\0mif1heic" + b"\0" * 64
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("photo.heic", heic, "image/heic"))],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.json()["filters"][0]["blurDataURL"] is None
+
+    # Stored as is, from the start of the file
+    assert uploaded == [heic]
+
+
+def test_upload_style_filters_renders_heic(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> None:
+    # Encoded by `pillow-heif`, registered by the app
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), (255, 0, 0)).save(buffer, format="HEIF")
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("photo.heic", buffer.getvalue(), "image/heic"))],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+
+    assert response.status_code == status.HTTP_201_CREATED
+
+    filter = response.json()["filters"][0]
+    assert filter["blurDataURL"].startswith("data:image/webp;base64,")
+    assert (local_storage.root / filter["imgId"]).exists()
+
+
+def test_delete_style_filters_deletes_images_in_background(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", (f"{i}.png", make_png(i), "image/png")) for i in range(2)],
+        headers=headers,
+    )
+    filters = response.json()["filters"]
+    images = [local_storage.root / filter["imgId"] for filter in filters]
+
+    response = client.delete(
+        "/api/filter",
+        params={"filterId": [filter["filterId"] for filter in filters]},
+        headers=headers,
+    )
+
+    # Only queued for deletion, the request doesn't wait for the storage
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    assert all(image.exists() for image in images)
+
+    portal(client).call(storage_deletion_worker.drain_batch)
+
+    assert not any(image.exists() for image in images)
+
+
+def test_delete_style_filters_keeps_shared_images(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+    png = make_png(20_001)
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", (f"{i}.png", png, "image/png")) for i in range(2)],
+        headers=headers,
+    )
+    filters = response.json()["filters"]
+    assert filters[0]["imgId"] == filters[1]["imgId"]
+    image = local_storage.root / filters[0]["imgId"]
+
+    response = client.delete(
+        "/api/filter", params={"filterId": [filters[0]["filterId"]]}, headers=headers
+    )
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+
+    portal(client).call(storage_deletion_worker.drain_batch)
+
+    # Still referenced by the other style filter
+    assert image.exists()
+
+
+def test_storage_deletion_worker_releases_db_connection(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+    metrics_headers: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("0.png", make_png(0), "image/png"))],
+        headers=headers,
+    )
+    filter_id = response.json()["filters"][0]["filterId"]
+    client.delete("/api/filter", params={"filterId": [filter_id]}, headers=headers)
+
+    checked_out: list[int] = []
+
+    def delete_unavailable(img_ids: list[str]) -> None:
+        checked_out.append(checked_out_connections())
+        raise ConnectionError("Storage unavailable")
+
+    monkeypatch.setattr(local_storage, "delete", delete_unavailable)
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    before = metrics["storageDeletions"]
+
+    assert portal(client).call(storage_deletion_worker.drain_batch) == 1
+
+    # No connection is held while the storage is called, and the failed deletion
+    # is rescheduled (not due anymore)
+    assert checked_out == [0]
+    assert portal(client).call(storage_deletion_worker.drain_batch) == 0
+
+    metrics = client.get("/api/metrics", headers=metrics_headers).json()
+    after = metrics["storageDeletions"]
+    assert after["failed"] == before["failed"] + 1
+    assert after["deleted"] == before["deleted"]
+
+
+def test_report_style_filter_queries(
+    client: TestClient,
+    queries: QueryCounter,
+    author: SeededAuthor,
+) -> None:
+    headers = {"Authorization": f"Bearer {author.access_token}"}
+    response = client.get(
+        "/api/filter",
+        params={"limit": 1, "authorId": str(author.public_user_id)},
+    )
+    filter_id = response.json()["filters"][0]["filterId"]
+    url = f"/api/filter/{filter_id}/report"
+    queries.reset()
+
+    response = client.patch(url, params={"type": "increment"}, headers=headers)
+
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["is_banned"] is False
+
+    # User, the report and the count (with the ban status)
+    assert len(queries.statements) == 1 + 1 + 1
+
+    response = client.patch(url, params={"type": "increment"}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.patch(url, params={"type": "decrement"}, headers=headers)
+    assert response.status_code == status.HTTP_200_OK
+
+    response = client.patch(url, params={"type": "decrement"}, headers=headers)
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    response = client.get(
+        "/api/filter",
+        params={"limit": 1, "authorId": str(author.public_user_id)},
+    )
+    assert response.json()["filters"][0]["reportCount"] == 0
+
+
+def test_report_style_filter_writes_to_primary(
+    client: TestClient,
+    queries: QueryCounter,
+    replica_queries: QueryCounter,
+    author: SeededAuthor,
+) -> None:
+    response = client.get(
+        "/api/filter",
+        params={"limit": 1, "authorId": str(author.public_user_id)},
+    )
+    filter_id = response.json()["filters"][0]["filterId"]
+    queries.reset()
+    replica_queries.reset()
+
+    response = client.patch(
+        f"/api/filter/{filter_id}/report",
+        params={"type": "increment"},
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # The user is looked up on the replica, the report and the count on the primary
+    assert len(replica_queries.statements) == 1
+    assert len(queries.statements) == 1 + 1
+
+
+def test_report_style_filter_releases_user_connection(
+    client: TestClient,
+    author: SeededAuthor,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    response = client.get(
+        "/api/filter",
+        params={"limit": 1, "authorId": str(author.public_user_id)},
+    )
+    filter_id = response.json()["filters"][0]["filterId"]
+
+    checked_out: list[int] = []
+    create = crud.filter_report.create
+
+    async def create_and_check(*args: Any, **kwargs: Any) -> int | None:
+        checked_out.append(checked_out_connections())
+        return await create(*args, **kwargs)
+
+    monkeypatch.setattr(crud.filter_report, "create", create_and_check)
+
+    response = client.patch(
+        f"/api/filter/{filter_id}/report",
+        params={"type": "increment"},
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    # The user was looked up with a session of its own, which is already closed
+    assert checked_out == [0]
@@ -0,0 +1,243 @@
+import asyncio
+import io
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+from uuid import UUID
+
+import pytest
+from anyio.from_thread import BlockingPortal
+from fastapi.testclient import TestClient
+from PIL import Image
+from sqlalchemy import delete, event, insert
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.main import app  # isort: split
+from app import utils
+from app.core import settings
+from app.crud.style_filter import feed_pages, feed_totals
+from app.crud.user import user_principals
+from app.db.base import engine, replicas
+from app.db.models import StorageDeletion, StyleFilter, User
+from app.db.pool import TimedQueuePool, create_engine
+from app.db.routing import Replica
+from app.utils import filter_storage
+from app.utils.image_derivatives import DerivativePipeline
+from app.utils.response_cache import MemoryResponseCacheBackend, ResponseCache
+from app.utils.storage_backends import LocalStorageBackend
+
+
+@dataclass
+class QueryCounter:
+    """Statements (and number of rows returned by them) issued by the app"""
+
+    statements: list[str] = field(default_factory=list)
+    rows: list[int] = field(default_factory=list)
+
+    @property
+    def total_rows(self) -> int:
+        return sum(self.rows)
+
+    def reset(self) -> None:
+        self.statements.clear()
+        self.rows.clear()
+
+
+@dataclass
+class SeededAuthor:
+    id: int
+    public_user_id: UUID
+    access_token: str
+    filter_count: int
+
+
+def run(coro: Any) -> Any:
+    return asyncio.run(coro)
+
+
+def portal(client: TestClient) -> BlockingPortal:
+    """Portal to the event loop of the app, which is running in the client fixture"""
+
+    assert client.portal is not None, "Client isn't running"
+    return client.portal
+
+
+def checked_out_connections() -> int:
+    """Number of connections checked out of the pool of the primary"""
+
+    assert isinstance(engine.pool, TimedQueuePool)
+    return engine.pool.checkedout()
+
+
+def make_png(seed: int) -> bytes:
+    """Small PNG, with different content for every seed"""
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), (seed % 256, seed // 256 % 256, 128)).save(
+        buffer, format="PNG"
+    )
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client() -> Iterator[TestClient]:
+    feed_totals.clear()
+
+    # Every request should hit the DB, so that the queries can be asserted
+    user_principals.enabled = False
+    feed_pages.enabled = False
+
+    # Background workers would issue queries too, they're run explicitly instead
+    settings.storage_deletion_worker_enabled = False
+
+    with TestClient(app) as client:
+        yield client
+
+        # Pooled connections are bound to the event loop of this client
+        portal(client).call(engine.dispose)
+
+
+def count_queries(db_engine: AsyncEngine) -> Iterator[QueryCounter]:
+    counter = QueryCounter()
+
+    def after_cursor_execute(
+        _conn: Any,
+        cursor: Any,
+        statement: str,
+        *_args: Any,
+    ) -> None:
+        counter.statements.append(statement)
+        counter.rows.append(max(cursor.rowcount, 0))
+
+    event.listen(db_engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    yield counter
+    event.remove(db_engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+
+
+@pytest.fixture
+def queries() -> Iterator[QueryCounter]:
+    yield from count_queries(engine)
+
+
+@pytest.fixture
+def replica_queries(client: TestClient) -> Iterator[QueryCounter]:
+    """Read replica (of the same DB), the statements sent to it are counted"""
+
+    replica = Replica("test", create_engine(str(settings.db_sqlalchemy_url)))
+    replicas.replicas.append(replica)
+
+    yield from count_queries(replica.engine)
+
+    replicas.replicas.remove(replica)
+    portal(client).call(replica.engine.dispose)
+
+
+@pytest.fixture
+def author() -> Iterator[SeededAuthor]:
+    """User with a lot of style filters"""
+
+    filter_count = 30
+    seed_engine = create_async_engine(
+        str(settings.db_sqlalchemy_url),
+        poolclass=NullPool,
+    )
+
+    async def seed() -> tuple[int, UUID]:
+        async with seed_engine.begin() as conn:
+            result = await conn.execute(
+                insert(User)
+                .values(
+                    username=f"author-{utils.auth.generate_token(16)}",
+                    email="author@example.com",
+                    profile_pic_url="http://localhost:8000/static/images/author.jpg",
+                )
+                .returning(User.id, User.public_user_id)
+            )
+            user_id, public_user_id = result.one()
+
+            await conn.execute(
+                insert(StyleFilter),
+                [
+                    {
+                        "base_img_url": f"http://localhost:8000/{i}.png",
+                        "blur_img_url": f"http://localhost:8000/{i}-blur.png",
+                        "small_img_url": f"http://localhost:8000/{i}-small.png",
+                        "img_id": f"test-{user_id}-{i}",
+                        "author_id": user_id,
+                    }
+                    for i in range(filter_count)
+                ],
+            )
+
+            return user_id, public_user_id
+
+    async def cleanup(user_id: int) -> None:
+        async with seed_engine.begin() as conn:
+            await conn.execute(
+                delete(StyleFilter).where(StyleFilter.author_id == user_id)
+            )
+            await conn.execute(delete(User).where(User.id == user_id))
+
+        await seed_engine.dispose()
+
+    user_id, public_user_id = run(seed())
+    access_token = utils.auth.create_access_token({"sub": str(public_user_id)})
+
+    yield SeededAuthor(user_id, public_user_id, access_token, filter_count)
+
+    run(cleanup(user_id))
+
+
+@pytest.fixture
+def feed_cache(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> ResponseCache:
+    """Empty in-process cache of the main feed pages"""
+
+    monkeypatch.setattr(feed_pages, "enabled", True)
+    monkeypatch.setattr(
+        feed_pages,
+        "backend",
+        MemoryResponseCacheBackend(max_size=16, ttl=feed_pages.ttl),
+    )
+
+    return feed_pages
+
+
+@pytest.fixture
+def metrics_headers(monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    """Headers of the requests to the metrics endpoint"""
+
+    monkeypatch.setattr(settings, "metrics_token", "metrics-token")
+    return {"Authorization": "Bearer metrics-token"}
+
+
+@pytest.fixture
+def local_storage(
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> Iterator[LocalStorageBackend]:
+    """Uploads are stored in a temporary directory instead of the storage service"""
+
+    backend = LocalStorageBackend(
+        root=str(tmp_path),
+        base_url="http://localhost:8000/static/style-filters",
+        derivatives=DerivativePipeline(max_workers=1),
+    )
+    monkeypatch.setattr(filter_storage, "backend", backend)
+
+    yield backend
+
+    # Image IDs are paths, which are the same in every test for the same content.
+    # Deletions left queued (e.g. failed) would block the uploads of other tests
+    async def cleanup() -> None:
+        cleanup_engine = create_async_engine(
+            str(settings.db_sqlalchemy_url),
+            poolclass=NullPool,
+        )
+        async with cleanup_engine.begin() as conn:
+            await conn.execute(delete(StorageDeletion))
+
+        await cleanup_engine.dispose()
+
+    run(cleanup())
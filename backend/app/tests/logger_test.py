@@ -0,0 +1,34 @@
+import logging
+import queue
+
+from app.core.logger import BoundedQueueHandler
+
+
+def test_queued_record_keeps_message_of_mutable_args() -> None:
+    record_queue: queue.Queue[logging.LogRecord] = queue.Queue()
+    handler = BoundedQueueHandler(record_queue, drop_policy="drop_new")
+
+    logger = logging.getLogger("test_queued_record")
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    files = ["a.png"]
+    logger.warning("Files %s, status %s", files, 201)
+    files.append("b.png")
+
+    logger.removeHandler(handler)
+    record = record_queue.get_nowait()
+
+    # Rendered when logged, not when the listener formats the record
+    assert record.getMessage() == "Files ['a.png'], status 201"
+
+
+def test_queued_record_keeps_immutable_args() -> None:
+    record_queue: queue.Queue[logging.LogRecord] = queue.Queue()
+    handler = BoundedQueueHandler(record_queue, drop_policy="drop_new")
+
+    record = logging.makeLogRecord({"msg": "%s %s", "args": ("GET", 200)})
+    handler.handle(record)
+
+    # Formatting is left to the listener (e.g. access log fields)
+    assert record_queue.get_nowait().args == ("GET", 200)
@@ -0,0 +1,100 @@
+import io
+from datetime import timedelta
+from functools import partial
+
+import pytest
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.reconcile_storage import ReconciliationReport, delete_orphans
+from app.tests.conftest import SeededAuthor, make_png, portal
+from app.utils.storage_backends import LocalStorageBackend
+
+
+def store_images(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> tuple[str, str]:
+    """Image referenced by a style filter, and an orphaned one"""
+
+    response = client.post(
+        "/api/filter",
+        files=[("files", ("referenced.png", make_png(10_000), "image/png"))],
+        headers={"Authorization": f"Bearer {author.access_token}"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    referenced = response.json()["filters"][0]["imgId"]
+
+    orphan = local_storage.upload(io.BytesIO(make_png(10_001)), "image/png")
+
+    return referenced, orphan.img_id
+
+
+def reconcile(client: TestClient, *, dry_run: bool) -> ReconciliationReport:
+    report = ReconciliationReport()
+
+    portal(client).call(
+        partial(
+            delete_orphans,
+            report,
+            page_size=10,
+            grace_period=timedelta(0),
+            dry_run=dry_run,
+        )
+    )
+
+    return report
+
+
+def test_reconcile_storage_deletes_orphans(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> None:
+    referenced, orphan = store_images(client, author, local_storage)
+
+    report = reconcile(client, dry_run=False)
+
+    assert report.images_listed == 1 + 1
+    assert report.orphans == report.orphans_deleted == 1
+    assert not report.has_problems
+    assert local_storage.get_existing([referenced, orphan]) == {referenced}
+
+    # Derivatives of the orphan are deleted along with it
+    stem = orphan.removesuffix(".png")
+    assert list(local_storage.root.glob(f"{stem}*")) == []
+
+
+def test_reconcile_storage_dry_run(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+) -> None:
+    referenced, orphan = store_images(client, author, local_storage)
+
+    report = reconcile(client, dry_run=True)
+
+    assert report.orphans == 1
+    assert report.orphans_deleted == 0
+    assert local_storage.get_existing([referenced, orphan]) == {referenced, orphan}
+
+
+def test_reconcile_storage_reports_failed_deletions(
+    client: TestClient,
+    author: SeededAuthor,
+    local_storage: LocalStorageBackend,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    referenced, orphan = store_images(client, author, local_storage)
+
+    def delete_unavailable(img_ids: list[str]) -> None:
+        raise ConnectionError("Storage unavailable")
+
+    monkeypatch.setattr(local_storage, "delete", delete_unavailable)
+
+    report = reconcile(client, dry_run=False)
+
+    assert report.orphans == report.orphans_failed == 1
+    assert report.orphans_deleted == 0
+    assert report.has_problems
@@ -0,0 +1,22 @@
+import io
+
+import pytest
+
+from app.tests.conftest import make_png
+from app.utils.storage_backends import LocalStorageBackend
+
+
+@pytest.mark.parametrize("content_type", ["image/png", None])
+def test_local_storage_delete_removes_derivatives(
+    local_storage: LocalStorageBackend,
+    content_type: str | None,
+) -> None:
+    img = local_storage.upload(io.BytesIO(make_png(30_000)), content_type)
+    kept = local_storage.upload(io.BytesIO(make_png(30_001)), content_type)
+
+    local_storage.delete([img.img_id])
+
+    # Original (without an extension if its type is unknown) and its derivatives
+    stem = img.img_id.removesuffix(".png")
+    assert list(local_storage.root.glob(f"{stem}*")) == []
+    assert local_storage.get_existing([img.img_id, kept.img_id]) == {kept.img_id}
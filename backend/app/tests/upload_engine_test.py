@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+from app.tests.conftest import run
+from app.utils.upload_engine import UploadEngine
+
+MAX_CONCURRENCY = 3
+MAX_CONCURRENCY_PER_REQUEST = 2
+
+
+class Tracker:
+    """Blocking call which records how many of its calls run at once"""
+
+    def __init__(self, duration: float = 0.05) -> None:
+        self.duration = duration
+        self.running = 0
+        self.max_running = 0
+        self.calls: list[int] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, item: int) -> int | None:
+        with self._lock:
+            self.calls.append(item)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        time.sleep(self.duration)
+
+        with self._lock:
+            self.running -= 1
+
+        return item
+
+
+def test_upload_engine_limits_concurrency_per_request() -> None:
+    engine = UploadEngine(
+        max_workers=8,
+        max_concurrency=8,
+        max_concurrency_per_request=MAX_CONCURRENCY_PER_REQUEST,
+    )
+    tracker = Tracker()
+
+    results = run(engine.map(tracker, range(6)))
+
+    assert results == list(range(6))
+    assert tracker.max_running == MAX_CONCURRENCY_PER_REQUEST
+
+
+def test_upload_engine_limits_concurrency_per_process() -> None:
+    engine = UploadEngine(
+        max_workers=8,
+        max_concurrency=MAX_CONCURRENCY,
+        max_concurrency_per_request=MAX_CONCURRENCY_PER_REQUEST,
+    )
+    tracker = Tracker()
+    request_count, item_count = 3, 4
+
+    async def requests() -> list[list[int | None]]:
+        return await asyncio.gather(
+            *(engine.map(tracker, range(item_count)) for _ in range(request_count))
+        )
+
+    results = run(requests())
+
+    # Per request limit alone would let 3 * 2 calls run at once
+    assert results == [list(range(item_count))] * request_count
+    assert tracker.max_running == MAX_CONCURRENCY
+
+    metrics = engine.metrics()
+    assert metrics.completed == request_count * item_count
+    assert metrics.queue_depth == metrics.in_flight == 0
+
+
+def test_upload_engine_skips_pending_items_after_failure() -> None:
+    engine = UploadEngine(
+        max_workers=4,
+        max_concurrency=MAX_CONCURRENCY,
+        max_concurrency_per_request=MAX_CONCURRENCY_PER_REQUEST,
+    )
+    tracker = Tracker()
+    failing, running = 0, 1
+    started = threading.Event()
+
+    def upload(item: int) -> int | None:
+        if item == failing:
+            # Fails while the other item is running
+            started.wait(timeout=1)
+            raise ConnectionError("Storage unavailable")
+
+        started.set()
+        return tracker(item)
+
+    results = run(engine.map(upload, range(5)))
+
+    # Item running along with the failed one is returned (to be cleaned up), the
+    # ones which hadn't started are skipped
+    assert results == [None, running, None, None, None]
+    assert tracker.calls == [running]
+
+    metrics = engine.metrics()
+    assert metrics.failed == 1
+    assert metrics.completed == 1
+
+
+def test_upload_engine_skips_pending_items_after_none_result() -> None:
+    engine = UploadEngine(
+        max_workers=4,
+        max_concurrency=MAX_CONCURRENCY,
+        max_concurrency_per_request=1,
+    )
+    tracker = Tracker(duration=0)
+    failing = 1
+
+    def upload(item: int) -> int | None:
+        tracker(item)
+        return None if item == failing else item
+
+    results = run(engine.map(upload, range(5)))
+
+    assert results == [0, None, None, None, None]
+    assert tracker.calls == [0, failing]
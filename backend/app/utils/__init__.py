@@ -1,3 +1,4 @@
 from .auth import AccessTokenPayload, auth
 from .email import email
-from .filter_storage import FilterUploadResult, filter_storage
+from .filter_storage import FilterUpload, FilterUploadResult, filter_storage
+from .upload_engine import upload_engine
@@ -1,6 +1,7 @@
 import secrets
 from datetime import UTC, datetime, timedelta
 from typing import Literal, TypedDict
+from uuid import UUID
 
 from cryptography.fernet import Fernet
 from jose import JWTError, jwt
@@ -9,8 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud
 from app.core import log, settings
 from app.core.exceptions import UnauthorizedError
-from app.db.models.user import User
-from app.schemas.auth import AuthToken
+from app.schemas.auth import AuthToken, UserPrincipal
 
 JWTKey = Literal["access", "refresh"]
 
@@ -55,7 +55,12 @@ class AuthManager:
         )
 
     @classmethod
-    async def decode_jwt_token(cls, db: AsyncSession, token: str, key: JWTKey) -> User:
+    async def decode_jwt_token(
+        cls,
+        db: AsyncSession,
+        token: str,
+        key: JWTKey,
+    ) -> UserPrincipal:
         """Decode refresh/access tokens as they both use same secret key"""
 
         try:
@@ -69,14 +74,14 @@ class AuthManager:
             if not isinstance(user_id, str):
                 raise UnauthorizedError()
 
-            user = await crud.user.get_by_public_user_id(db, user_id)
+            user = await crud.user.get_principal(db, UUID(user_id))
 
             if not user:
                 raise UnauthorizedError()
 
             return user
-        except JWTError as e:
-            log.error(f"Failed to decode access token: {token}, error: {e}")
+        except (JWTError, ValueError) as e:
+            log.error("Failed to decode access token: %s, error: %s", token, e)
             raise UnauthorizedError() from e
 
     @classmethod
@@ -91,12 +96,12 @@ class AuthManager:
             user_id = payload.get("sub")
 
             if user_id is None:
-                log.error(f"Failed to decode JWT token: {token}")
+                log.error("Failed to decode JWT token: %s", token)
                 raise UnauthorizedError()
 
             return AuthToken(user_id=user_id)
         except JWTError as e:
-            log.error(f"Failed to decode JWT token: {token}, error: {e}")
+            log.error("Failed to decode JWT token: %s, error: %s", token, e)
             raise UnauthorizedError()
 
     # ==================================
@@ -0,0 +1,74 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+from app import schemas
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    In-process LRU cache whose entries expire after `ttl` seconds. When it's full,
+    the least recently used entry is evicted.
+
+    It's meant to be used from the event loop thread only (no locking).
+    """
+
+    def __init__(self, max_size: int, ttl: float, *, enabled: bool = True) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: K) -> V | None:
+        if not self.enabled:
+            return None
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        if not self.enabled:
+            return
+
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: K) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def metrics(self) -> schemas.CacheMetrics:
+        return schemas.CacheMetrics(
+            size=len(self._entries),
+            maxSize=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+        )
@@ -19,7 +19,7 @@ class EmailManager:
     @classmethod
     async def send_magic_link(cls, email: EmailStr, token: str) -> None:
         try:
-            log.info(f"Sending magic link email to {email}. Token: {token}")
+            log.info("Sending magic link email to %s. Token: %s", email, token)
 
             magic_link = f"{settings.frontend_url}/login/{token}"
 
@@ -48,7 +48,7 @@ class EmailManager:
             fm = FastMail(conf)
             await fm.send_message(msg)
         except Exception as e:
-            log.error(f"Failed to send magic link email: {e}")
+            log.error("Failed to send magic link email: %s", e)
 
 
 email = EmailManager()
@@ -6,6 +6,7 @@ class HttpHeader(Enum):
 
     REQUEST_ID = "X-Request-ID"
     PROCESS_TIME = "X-Process-Time"
+    DB_CHECKOUT_TIME = "X-DB-Checkout-Time"
 
 
 class Cookie(Enum):
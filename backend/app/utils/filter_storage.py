@@ -1,14 +1,20 @@
 from dataclasses import dataclass
+from typing import Any
 
-import cloudinary
-import cloudinary.api
-from cloudinary.uploader import upload_image
-from cloudinary.utils import cloudinary_url
 from fastapi import UploadFile
 
-from app.core import log, settings
+from app.core import log
 
-from .enums import CloudinaryFolderPath
+from .storage_backends import StorageBackend, create_storage_backend
+from .upload_engine import UploadEngine, upload_engine
+
+
+class FilterUpload(UploadFile):
+    """Uploaded style filter image along with the SHA-256 hash of its content"""
+
+    def __init__(self, *args: Any, content_hash: str, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.content_hash = content_hash
 
 
 @dataclass
@@ -17,6 +23,8 @@ class FilterUploadResult:
     base_img_url: str
     blur_img_url: str
     small_img_url: str
+    blur_data_url: str | None
+    content_hash: str
 
 
 class FilterStorage:
@@ -37,59 +45,61 @@ class FilterStorage:
         "heics",
     ]
 
-    def __init__(self) -> None:
-        self.config = cloudinary.config(
-            secure=True,
-            cloud_name=settings.cloudinary_cloud_name,
-            api_key=settings.cloudinary_cloud_key,
-            api_secret=settings.cloudinary_cloud_secret,
-        )
+    def __init__(self, engine: UploadEngine, backend: StorageBackend) -> None:
+        self.engine = engine
+        self.backend = backend
 
-    def upload(self, file: UploadFile) -> FilterUploadResult | None:
+    def upload(self, file: FilterUpload) -> FilterUploadResult | None:
         try:
-            img = upload_image(
-                file.file, folder=CloudinaryFolderPath.STYLE_FILTER.value
-            )
+            img = self.backend.upload(file.file, file.content_type)
 
-            img_id = img.public_id
-            img_url = img.url
-
-            if not isinstance(img_id, str):
-                log.error(f"Failed to upload img: public_id {img_id}, url {img_url}")
-                return None
-
-            blur_img_url = self.get_blur_image(img_id)
-            small_img_url = self.get_small_image(img_id)
+            blur_img_url = self.get_blur_image(img.img_id)
+            small_img_url = self.get_small_image(img.img_id)
 
             log.info("Image uploaded")
-            return FilterUploadResult(img_id, img_url, blur_img_url, small_img_url)
+            return FilterUploadResult(
+                img.img_id,
+                img.url,
+                blur_img_url,
+                small_img_url,
+                img.blur_data_url,
+                file.content_hash,
+            )
         except Exception as e:
-            log.error(f"Failed to upload image: {e}")
+            log.error("Failed to upload image: %s", e)
             return None
 
+    async def upload_many(self, files: list[FilterUpload]) -> list[FilterUploadResult]:
+        """
+        Upload files concurrently without blocking the event loop. Only successful
+        uploads are returned, so the caller can compare it with the input files and
+        rollback (delete) the uploaded ones if any of them has failed.
+        """
+
+        results = await self.engine.map(self.upload, files)
+        return [result for result in results if result is not None]
+
     def delete(self, img_ids: set[str]) -> None:
-        log.info(img_ids)
-        cloudinary.api.delete_resources(list(img_ids))
+        log.info("Deleting images %s", img_ids)
+        self.backend.delete(list(img_ids))
 
-    def get_blur_image(self, img_public_id: str) -> str:
-        img_url, _opts = cloudinary_url(
-            img_public_id,
-            transformation=[{"effect": "blur:1000"}, {"quality": "auto"}],
-        )
+    async def delete_many(self, img_ids: set[str]) -> None:
+        """Delete images without blocking the event loop"""
 
-        return img_url
+        if len(img_ids) == 0:
+            return
 
-    def get_small_image(self, img_public_id: str) -> str:
-        img_url, _opts = cloudinary_url(
-            img_public_id,
-            transformation=[{"width": 400}, {"height": 280}, {"crop": "fill"}],
-        )
+        await self.engine.run(self.delete, img_ids)
 
-        return img_url
+    def get_blur_image(self, img_public_id: str) -> str:
+        return self.backend.get_blur_image(img_public_id)
+
+    def get_small_image(self, img_public_id: str) -> str:
+        return self.backend.get_small_image(img_public_id)
 
     @staticmethod
     def to_mb(size: int) -> float:
         return size / (1024 * 1024)
 
 
-filter_storage = FilterStorage()
+filter_storage = FilterStorage(upload_engine, create_storage_backend())
@@ -0,0 +1,56 @@
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Rendering is run by the worker processes, which import its module: it doesn't
+# import the rest of the app
+from app.derivatives import Derivatives, render_derivatives
+
+
+class DerivativePipeline:
+    """
+    Renders image derivatives in a process pool, so that CPU bound decoding and
+    resizing doesn't hold the GIL of the API workers. `render` blocks until the
+    derivatives are ready and is meant to be called from the upload engine's
+    threads.
+
+    With `files` unset, only the inline placeholder is rendered (e.g. when the
+    storage service renders the other derivatives itself).
+    """
+
+    def __init__(self, max_workers: int, *, files: bool = True) -> None:
+        self.max_workers = max_workers
+        self.files = files
+
+        # Created on first use, so that processes which never render (e.g. the
+        # workers themselves) don't spawn a pool
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def render(self, content: bytes) -> Derivatives:
+        executor = self._get_executor()
+
+        try:
+            return executor.submit(render_derivatives, content, self.files).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for using too much memory), the pool can't
+            # be used anymore and is re-created for the next render
+            with self._executor_lock:
+                if self._executor is executor:
+                    self._executor = None
+
+            executor.shutdown(wait=False)
+            raise
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # Forking a process with running threads (event loop, logging,
+                # upload engine) isn't safe, hence the workers are spawned
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+
+            return self._executor
@@ -0,0 +1,256 @@
+import asyncio
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
+
+import orjson
+
+from app import schemas
+from app.core import log, settings
+
+from .cache import TTLCache
+
+# Bumped along with every tag, entries computed while it changed aren't stored
+GENERATION_TAG = "generation"
+
+
+class ResponseCacheBackend(ABC):
+    """Storage of the cached responses and of the current versions of the tags"""
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        pass
+
+    @abstractmethod
+    async def get_versions(self, tags: list[str]) -> list[str | None]:
+        """Current versions of the tags, `None` for the tags never bumped"""
+
+    @abstractmethod
+    async def bump(self, tags: list[str], ttl: float) -> None:
+        """Set new versions of the tags, kept for (at least) `ttl` seconds"""
+
+    def size(self) -> int:
+        """Number of cached responses held by this process"""
+
+        return 0
+
+    async def close(self) -> None:
+        """Release the connections of the backend, if any"""
+
+
+class MemoryResponseCacheBackend(ResponseCacheBackend):
+    """In-process backend, only the changes made by this process invalidate it"""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.entries: TTLCache[str, bytes] = TTLCache(max_size=max_size, ttl=ttl)
+
+        # Tag versions aren't evicted before they expire, otherwise an entry stored
+        # before a tag was ever bumped could become valid again
+        self.versions: dict[str, tuple[float, str]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.entries.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        self.entries.set(key, value)
+
+    async def get_versions(self, tags: list[str]) -> list[str | None]:
+        now = time.monotonic()
+        versions: list[str | None] = []
+
+        for tag in tags:
+            entry = self.versions.get(tag)
+            versions.append(entry[1] if entry is not None and entry[0] > now else None)
+
+        return versions
+
+    async def bump(self, tags: list[str], ttl: float) -> None:
+        now = time.monotonic()
+
+        for tag in tags:
+            self.versions[tag] = (now + ttl, secrets.token_hex(8))
+
+        # Drop the expired versions once in a while, there is one per changed filter
+        if len(self.versions) > self.entries.max_size:
+            self.versions = {
+                tag: entry for tag, entry in self.versions.items() if entry[0] > now
+            }
+
+    def size(self) -> int:
+        return len(self.entries)
+
+
+class RedisResponseCacheBackend(ResponseCacheBackend):
+    """Backend shared by all of the worker processes, stored in Redis"""
+
+    def __init__(self, url: str, prefix: str) -> None:
+        # Optional dependency, only needed for this backend
+        from redis.asyncio import Redis
+
+        self.redis = Redis.from_url(url)
+        self.prefix = prefix
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.redis.get(self.prefix + key)
+
+    async def set(self, key: str, value: bytes, ttl: float) -> None:
+        await self.redis.set(self.prefix + key, value, px=int(ttl * 1000))
+
+    async def get_versions(self, tags: list[str]) -> list[str | None]:
+        versions = await self.redis.mget([self.prefix + tag for tag in tags])
+        return [None if v is None else v.decode() for v in versions]
+
+    async def bump(self, tags: list[str], ttl: float) -> None:
+        async with self.redis.pipeline(transaction=False) as pipeline:
+            for tag in tags:
+                pipeline.set(
+                    self.prefix + tag, secrets.token_hex(8), px=int(ttl * 1000)
+                )
+            await pipeline.execute()
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class ResponseCache:
+    """
+    Cache of serialized responses, invalidated by tags: every entry is stored with
+    the versions of its tags (e.g. the feed, and each style filter on the page), and
+    is stale once any of them has been bumped since.
+
+    Concurrent misses of the same key are collapsed into a single computation
+    (per process). The backend being unavailable is treated as a miss.
+    """
+
+    def __init__(
+        self,
+        backend: ResponseCacheBackend,
+        ttl: float,
+        *,
+        enabled: bool = True,
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+        self._computing: dict[str, asyncio.Task[bytes]] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_set(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[tuple[bytes, list[str]]]],
+    ) -> bytes:
+        """
+        Cached response of the key, or the one returned by `compute` (along with
+        its tags), which is then cached
+        """
+
+        if not self.enabled:
+            value, _tags = await compute()
+            return value
+
+        cached = await self._get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+
+        # Leader's computation runs in a task of its own, so that the ones waiting
+        # for it aren't affected by the leader being cancelled. As it can outlive
+        # the leader, `compute` mustn't use anything owned by the leader's request
+        # (e.g. its DB session)
+        computing = self._computing.get(key)
+        if computing is None:
+            computing = asyncio.create_task(self._compute_and_set(key, compute))
+            computing.add_done_callback(lambda _: self._computing.pop(key, None))
+            self._computing[key] = computing
+
+        return await asyncio.shield(computing)
+
+    async def invalidate(self, tags: set[str]) -> None:
+        if not self.enabled or len(tags) == 0:
+            return
+
+        try:
+            await self.backend.bump([*tags, GENERATION_TAG], self.ttl)
+        except Exception as e:
+            # Entries expire after the TTL anyway
+            log.error("Failed to invalidate cached responses %s: %s", tags, e)
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def metrics(self) -> schemas.CacheMetrics:
+        return schemas.CacheMetrics(
+            size=self.backend.size(),
+            maxSize=settings.feed_cache_size,
+            hits=self.hits,
+            misses=self.misses,
+        )
+
+    async def _get(self, key: str) -> bytes | None:
+        try:
+            entry = await self.backend.get(key)
+            if entry is None:
+                return None
+
+            header, value = entry.split(b"\n", 1)
+            versions: dict[str, str | None] = orjson.loads(header)
+
+            current = await self.backend.get_versions(list(versions))
+            if current != list(versions.values()):
+                return None
+
+            return value
+        except Exception as e:
+            log.error("Failed to get cached response %s: %s", key, e)
+            return None
+
+    async def _compute_and_set(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[tuple[bytes, list[str]]]],
+    ) -> bytes:
+        try:
+            [generation] = await self.backend.get_versions([GENERATION_TAG])
+        except Exception as e:
+            log.error("Failed to get cached response %s: %s", key, e)
+            value, _tags = await compute()
+            return value
+
+        value, tags = await compute()
+
+        try:
+            # Something changed while computing, the response might already be stale
+            current = await self.backend.get_versions([GENERATION_TAG, *tags])
+            if current[0] != generation:
+                return value
+
+            header = orjson.dumps(dict(zip(tags, current[1:])))
+            await self.backend.set(key, header + b"\n" + value, self.ttl)
+        except Exception as e:
+            log.error("Failed to cache response %s: %s", key, e)
+
+        return value
+
+
+def create_response_cache_backend() -> ResponseCacheBackend:
+    if settings.feed_cache_backend == "redis":
+        return RedisResponseCacheBackend(
+            settings.feed_cache_redis_url,
+            prefix="picasso:feed:",
+        )
+
+    return MemoryResponseCacheBackend(
+        max_size=settings.feed_cache_size,
+        ttl=settings.feed_cache_ttl,
+    )
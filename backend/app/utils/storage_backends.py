@@ -0,0 +1,323 @@
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import BinaryIO
+
+import cloudinary
+import cloudinary.api
+from cloudinary.uploader import upload_image
+from cloudinary.utils import cloudinary_url
+
+from app.core import log, settings
+from app.derivatives import BLUR_DERIVATIVE, SMALL_DERIVATIVE
+
+from .enums import CloudinaryFolderPath
+from .image_derivatives import DerivativePipeline
+
+
+@dataclass
+class StoredImage:
+    img_id: str
+    url: str
+    blur_data_url: str | None
+
+
+@dataclass
+class ListedImage:
+    img_id: str
+    created_at: datetime
+
+
+class StorageBackend(ABC):
+    """
+    Where the style filter images are stored. All the methods are blocking and are
+    run in the upload engine's thread pool.
+    """
+
+    @abstractmethod
+    def upload(self, file: BinaryIO, content_type: str | None) -> StoredImage:
+        """Store the original image, raises on failure"""
+
+    @abstractmethod
+    def delete(self, img_ids: list[str]) -> None:
+        """Delete the images (and their derivatives), missing ones are ignored"""
+
+    @abstractmethod
+    def get_blur_image(self, img_id: str) -> str:
+        """URL of the blurred placeholder of the image"""
+
+    @abstractmethod
+    def get_small_image(self, img_id: str) -> str:
+        """URL of the 400x280 thumbnail of the image"""
+
+    @abstractmethod
+    def list_images(self, page_size: int) -> Iterator[list[ListedImage]]:
+        """All of the stored (original) images, page by page"""
+
+    @abstractmethod
+    def get_existing(self, img_ids: list[str]) -> set[str]:
+        """Images (of the given ones) which are stored"""
+
+
+class CloudinaryStorageBackend(StorageBackend):
+    """
+    Images are stored in Cloudinary and derivatives are transformation URLs. The
+    derivatives are generated eagerly on upload, so that the first request for them
+    doesn't have to wait for the transformation. Only the inline placeholder is
+    rendered locally, on a best-effort basis: Cloudinary might accept images which
+    Pillow can't decode.
+    """
+
+    BLUR_TRANSFORMATION = [{"effect": "blur:1000"}, {"quality": "auto"}]
+    SMALL_TRANSFORMATION = [{"width": 400, "height": 280, "crop": "fill"}]
+
+    # Limits of a single Admin API call (listing page, IDs per lookup)
+    MAX_PAGE_SIZE = 500
+    MAX_IDS_PER_CALL = 100
+
+    def __init__(self, derivatives: DerivativePipeline) -> None:
+        self.derivatives = derivatives
+        self.config = cloudinary.config(
+            secure=True,
+            cloud_name=settings.cloudinary_cloud_name,
+            api_key=settings.cloudinary_cloud_key,
+            api_secret=settings.cloudinary_cloud_secret,
+        )
+
+    def upload(self, file: BinaryIO, content_type: str | None) -> StoredImage:
+        placeholder: str | None = None
+        try:
+            placeholder = self.derivatives.render(file.read()).placeholder
+        except Exception as e:
+            log.warning("Failed to render the placeholder of an upload: %s", e)
+        file.seek(0)
+
+        img = upload_image(
+            file,
+            folder=CloudinaryFolderPath.STYLE_FILTER.value,
+            eager=[
+                {"transformation": self.BLUR_TRANSFORMATION},
+                {"transformation": self.SMALL_TRANSFORMATION},
+            ],
+        )
+
+        if not isinstance(img.public_id, str):
+            raise ValueError(f"Invalid public_id {img.public_id}, url {img.url}")
+
+        return StoredImage(img.public_id, img.url, placeholder)
+
+    def delete(self, img_ids: list[str]) -> None:
+        cloudinary.api.delete_resources(img_ids)
+
+    def list_images(self, page_size: int) -> Iterator[list[ListedImage]]:
+        next_cursor: str | None = None
+
+        while True:
+            response = cloudinary.api.resources(
+                type="upload",
+                resource_type="image",
+                prefix=f"{CloudinaryFolderPath.STYLE_FILTER.value}/",
+                max_results=min(page_size, self.MAX_PAGE_SIZE),
+                next_cursor=next_cursor,
+            )
+
+            yield [
+                ListedImage(
+                    resource["public_id"],
+                    datetime.fromisoformat(resource["created_at"]),
+                )
+                for resource in response["resources"]
+            ]
+
+            next_cursor = response.get("next_cursor")
+            if not next_cursor:
+                return
+
+    def get_existing(self, img_ids: list[str]) -> set[str]:
+        existing: set[str] = set()
+
+        for i in range(0, len(img_ids), self.MAX_IDS_PER_CALL):
+            response = cloudinary.api.resources_by_ids(
+                img_ids[i : i + self.MAX_IDS_PER_CALL],
+                max_results=self.MAX_IDS_PER_CALL,
+            )
+            existing.update(resource["public_id"] for resource in response["resources"])
+
+        return existing
+
+    def get_blur_image(self, img_id: str) -> str:
+        img_url, _opts = cloudinary_url(
+            img_id,
+            transformation=self.BLUR_TRANSFORMATION,
+        )
+
+        return img_url
+
+    def get_small_image(self, img_id: str) -> str:
+        img_url, _opts = cloudinary_url(
+            img_id,
+            transformation=self.SMALL_TRANSFORMATION,
+        )
+
+        return img_url
+
+
+class LocalStorageBackend(StorageBackend):
+    """
+    Images are stored on the local disk at content-addressed paths (SHA-256 of the
+    file), e.g. `ab/abcdef...png`, and served by the `/static` mount. The image ID
+    is the path relative to the storage root. Derivatives are rendered on upload
+    and stored next to the original, e.g. `ab/abcdef....small.jpg`.
+
+    Meant for self-hosted deployments, development and benchmarks (no network
+    round trip per image).
+    """
+
+    EXTENSIONS = {
+        "image/png": ".png",
+        "image/jpeg": ".jpg",
+        "image/jpg": ".jpg",
+        "image/heic": ".heic",
+        "image/heif": ".heif",
+        "image/heics": ".heics",
+    }
+
+    def __init__(
+        self,
+        root: str,
+        base_url: str,
+        derivatives: DerivativePipeline,
+    ) -> None:
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+        self.derivatives = derivatives
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def upload(self, file: BinaryIO, content_type: str | None) -> StoredImage:
+        content = file.read()
+        digest = hashlib.sha256(content).hexdigest()
+        extension = self.EXTENSIONS.get(content_type or "", "")
+
+        img_id = f"{digest[:2]}/{digest}{extension}"
+        path = self._path(img_id)
+
+        # Rendered even if the image is already stored, for the placeholder
+        derivatives = self.derivatives.render(content)
+
+        # Same content is stored once, hence an existing file is left as is (but
+        # touched, so that the reconciliation doesn't take it as an old orphan). The
+        # original is written last, so that its presence means that the
+        # derivatives are there too
+        if path.exists():
+            os.utime(path)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            for name, derivative in derivatives.files.items():
+                self._write(self._path(self._derivative_id(img_id, name)), derivative)
+
+            self._write(path, content)
+
+        return StoredImage(img_id, self._url(img_id), derivatives.placeholder)
+
+    def delete(self, img_ids: list[str]) -> None:
+        for img_id in img_ids:
+            path = self._path(img_id)
+            stem = path.name.removesuffix(path.suffix)
+
+            # Derivatives first, the original (which has no extension if its type
+            # is unknown) last, as its presence means that the derivatives are there
+            for derivative_path in path.parent.glob(f"{stem}.*"):
+                if derivative_path != path:
+                    derivative_path.unlink(missing_ok=True)
+
+            path.unlink(missing_ok=True)
+
+    def list_images(self, page_size: int) -> Iterator[list[ListedImage]]:
+        page: list[ListedImage] = []
+
+        for directory in sorted(self.root.iterdir()):
+            if not directory.is_dir():
+                continue
+
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # Skip the derivatives (`<hash>.<derivative>.<extension>`) and
+                    # the temporary files of the writes in progress
+                    if entry.name.startswith(".") or entry.name.count(".") > 1:
+                        continue
+
+                    page.append(
+                        ListedImage(
+                            f"{directory.name}/{entry.name}",
+                            datetime.fromtimestamp(entry.stat().st_mtime, UTC),
+                        )
+                    )
+
+                    if len(page) == page_size:
+                        yield page
+                        page = []
+
+        if page:
+            yield page
+
+    def get_existing(self, img_ids: list[str]) -> set[str]:
+        return {img_id for img_id in img_ids if self._path(img_id).exists()}
+
+    def get_blur_image(self, img_id: str) -> str:
+        return self._url(self._derivative_id(img_id, BLUR_DERIVATIVE))
+
+    def get_small_image(self, img_id: str) -> str:
+        return self._url(self._derivative_id(img_id, SMALL_DERIVATIVE))
+
+    def _write(self, path: Path, content: bytes) -> None:
+        # Write to a temporary file first, so that a partially written image is
+        # never served
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        try:
+            with os.fdopen(fd, "wb") as tmp_file:
+                tmp_file.write(content)
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _derivative_id(img_id: str, name: str) -> str:
+        stem, _dot, _extension = img_id.rpartition(".")
+        return f"{stem or img_id}.{name}"
+
+    def _path(self, img_id: str) -> Path:
+        path = (self.root / img_id).resolve()
+
+        if not path.is_relative_to(self.root):
+            raise ValueError(f"Image ID outside of the storage root: {img_id}")
+
+        return path
+
+    def _url(self, img_id: str) -> str:
+        return f"{self.base_url}/{img_id}"
+
+
+def create_storage_backend() -> StorageBackend:
+    if settings.storage_backend == "local":
+        return LocalStorageBackend(
+            root=settings.storage_local_path,
+            base_url=settings.storage_local_base_url,
+            derivatives=DerivativePipeline(
+                max_workers=settings.upload_derivative_workers,
+            ),
+        )
+
+    return CloudinaryStorageBackend(
+        derivatives=DerivativePipeline(
+            max_workers=settings.upload_derivative_workers,
+            files=False,
+        ),
+    )
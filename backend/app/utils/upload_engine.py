@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Iterable, TypeVar
+
+from app import schemas
+from app.core import log, settings
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _SkippedError(Exception):
+    """Item of a batch which isn't run, as another item of the batch has failed"""
+
+
+class UploadEngine:
+    """
+    Runs blocking storage calls (uploads, deletes) in a bounded thread pool so
+    that they don't block the event loop.
+
+    Concurrency is capped at two levels: process wide (shared by all the requests
+    handled by this worker) and per batch (a single request can't take all of the
+    process wide slots).
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_concurrency: int,
+        max_concurrency_per_request: int,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_concurrency_per_request = max_concurrency_per_request
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="upload-engine",
+        )
+
+        # Semaphores are bound to the event loop they are first used in, hence
+        # it's created lazily (and re-created if the loop changes, e.g. in tests)
+        self._semaphore: asyncio.Semaphore | None = None
+        self._semaphore_loop: asyncio.AbstractEventLoop | None = None
+
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._latency_lock = threading.Lock()
+        self._latency_count = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latency_last = 0.0
+
+    async def run(self, fn: Callable[..., R], *args: object) -> R:
+        """Run a blocking call in the thread pool (within process wide limit)"""
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(loop)
+
+        self._queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        self._in_flight += 1
+        try:
+            return await loop.run_in_executor(self._executor, partial(fn, *args))
+        finally:
+            self._in_flight -= 1
+            semaphore.release()
+
+    async def map(
+        self,
+        fn: Callable[[T], R | None],
+        items: Iterable[T],
+    ) -> list[R | None]:
+        """
+        Run `fn` for every item concurrently (within per request and process wide
+        limits). A `None` result or an exception is counted as a failure, and
+        `None` is returned for the item. Once an item has failed, the items which
+        haven't started yet are skipped (`None` is returned for them too), while
+        the results of the ones already running are returned, e.g. so that the
+        caller can clean them up.
+
+        Results are returned in the same order as the items.
+        """
+
+        semaphore = asyncio.Semaphore(self.max_concurrency_per_request)
+
+        # Set from the event loop, checked by the worker threads too
+        failure = threading.Event()
+
+        def timed(item: T) -> R | None:
+            # Last check right before the call, the item might have been waiting
+            # for a worker thread
+            if failure.is_set():
+                raise _SkippedError()
+
+            start = time.perf_counter()
+            try:
+                return fn(item)
+            finally:
+                self._record_latency(time.perf_counter() - start)
+
+        async def run_one(item: T) -> R | None:
+            async with semaphore:
+                try:
+                    if failure.is_set():
+                        raise _SkippedError()
+
+                    result = await self.run(timed, item)
+                except _SkippedError:
+                    return None
+                except Exception as e:
+                    log.error("Upload engine call failed: %s", e)
+                    result = None
+
+                if result is None:
+                    self._failed += 1
+                    failure.set()
+                else:
+                    self._completed += 1
+
+                return result
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+    def metrics(self) -> schemas.UploadEngineMetrics:
+        count = self._latency_count
+        avg = self._latency_total / count if count else 0.0
+
+        return schemas.UploadEngineMetrics(
+            queueDepth=self._queued,
+            inFlight=self._in_flight,
+            completed=self._completed,
+            failed=self._failed,
+            latencyAvgMs=avg * 1000,
+            latencyMaxMs=self._latency_max * 1000,
+            latencyLastMs=self._latency_last * 1000,
+        )
+
+    def _get_semaphore(self, loop: asyncio.AbstractEventLoop) -> asyncio.Semaphore:
+        if self._semaphore is None or self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphore_loop = loop
+
+        return self._semaphore
+
+    def _record_latency(self, seconds: float) -> None:
+        # Called from the worker threads
+        with self._latency_lock:
+            self._latency_count += 1
+            self._latency_total += seconds
+            self._latency_last = seconds
+            self._latency_max = max(self._latency_max, seconds)
+
+
+upload_engine = UploadEngine(
+    max_workers=settings.upload_max_workers,
+    max_concurrency=settings.upload_max_concurrency,
+    max_concurrency_per_request=settings.upload_max_concurrency_per_request,
+)
@@ -0,0 +1,213 @@
+import hashlib
+import io
+from typing import NoReturn
+
+import filetype
+from fastapi import Request
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.datastructures import Headers
+
+from app.core.exceptions import (
+    BadRequestError,
+    EntityTooLargeError,
+    UnsupportedMediaTypeError,
+)
+
+from .filter_storage import FilterStorage, FilterUpload
+
+
+class _Part:
+    def __init__(self) -> None:
+        self.headers: list[tuple[bytes, bytes]] = []
+        self.header_field = bytearray()
+        self.header_value = bytearray()
+
+        self.field_name = ""
+        self.filename: str | None = None
+        self.content_type: str | None = None
+        self.content = bytearray()
+        self.content_hash = hashlib.sha256()
+        self.sniffed = False
+
+
+class StreamingUploadParser:
+    """
+    Parses a `multipart/form-data` request body while it's being received, unlike
+    Starlette's form parser, which spools every file to a temporary file before
+    the handler runs.
+
+    File parts of `field_name` are kept in memory and checked as soon as possible:
+    the declared content type once the part's headers are received, the actual
+    type (magic bytes) once its first bytes are received, and the per file and
+    per request size caps on every chunk. Any violation aborts the parsing right
+    away, without reading the rest of the body. Other parts are skipped, but count
+    towards the request size.
+
+    Content of the files is hashed (SHA-256) while it's received, for deduplication.
+    """
+
+    # Number of bytes that `filetype` needs to detect the type
+    SNIFF_SIZE = 261
+
+    def __init__(
+        self,
+        field_name: str,
+        supported_types: list[str],
+        max_file_size: int,
+        max_request_size: int,
+    ) -> None:
+        self.field_name = field_name
+        self.supported_types = supported_types
+        self.max_file_size = max_file_size
+        self.max_request_size = max_request_size
+
+        self.files: list[FilterUpload] = []
+        self.request_size = 0
+        self._part = _Part()
+
+    async def parse(self, req: Request) -> list[FilterUpload]:
+        content_type, params = parse_options_header(req.headers.get("content-type"))
+        if content_type != b"multipart/form-data":
+            raise UnsupportedMediaTypeError(
+                message="Request body must be multipart/form-data",
+                reason="Invalid content type",
+            )
+
+        boundary = params.get(b"boundary")
+        if not boundary:
+            raise BadRequestError(message="Missing multipart boundary")
+
+        # Reject early if the client tells upfront that the body is too large
+        content_length = req.headers.get("content-length")
+        if content_length and content_length.isdigit():
+            self._check_request_size(int(content_length))
+
+        parser = MultipartParser(
+            boundary,
+            {
+                "on_part_begin": self._on_part_begin,
+                "on_part_data": self._on_part_data,
+                "on_part_end": self._on_part_end,
+                "on_header_field": self._on_header_field,
+                "on_header_value": self._on_header_value,
+                "on_header_end": self._on_header_end,
+                "on_headers_finished": self._on_headers_finished,
+            },
+        )
+
+        try:
+            async for chunk in req.stream():
+                self.request_size += len(chunk)
+                self._check_request_size(self.request_size)
+
+                parser.write(chunk)
+
+            parser.finalize()
+        except MultipartParseError as e:
+            raise BadRequestError(message=f"Invalid multipart body: {e}") from e
+
+        if len(self.files) == 0:
+            raise BadRequestError(message=f"No files in '{self.field_name}'")
+
+        return self.files
+
+    def _on_part_begin(self) -> None:
+        self._part = _Part()
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._part.header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._part.header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        part = self._part
+        part.headers.append(
+            (bytes(part.header_field).lower(), bytes(part.header_value))
+        )
+        part.header_field.clear()
+        part.header_value.clear()
+
+    def _on_headers_finished(self) -> None:
+        part = self._part
+        headers = dict(part.headers)
+
+        _disposition, options = parse_options_header(
+            headers.get(b"content-disposition")
+        )
+        part.field_name = options.get(b"name", b"").decode("latin-1")
+
+        filename = options.get(b"filename")
+        if filename is None or part.field_name != self.field_name:
+            return
+
+        part.filename = filename.decode("utf-8", errors="replace")
+        part.content_type = headers.get(b"content-type", b"").decode("latin-1")
+
+        if part.content_type not in self.supported_types:
+            self._raise_invalid_type(part)
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        part = self._part
+        if part.filename is None:
+            return
+
+        part.content += data[start:end]
+        part.content_hash.update(data[start:end])
+
+        if len(part.content) > self.max_file_size:
+            max_file_size_in_mb = FilterStorage.to_mb(self.max_file_size)
+
+            raise EntityTooLargeError(
+                message=(
+                    f"File size must be less than {max_file_size_in_mb} MB, "
+                    f"{part.filename} is larger"
+                ),
+                reason="Upload file size exceeded",
+            )
+
+        if not part.sniffed and len(part.content) >= self.SNIFF_SIZE:
+            self._sniff(part)
+
+    def _on_part_end(self) -> None:
+        part = self._part
+        if part.filename is None:
+            return
+
+        if not part.sniffed:
+            self._sniff(part)
+
+        self.files.append(
+            FilterUpload(
+                file=io.BytesIO(part.content),
+                size=len(part.content),
+                filename=part.filename,
+                headers=Headers(raw=part.headers),
+                content_hash=part.content_hash.hexdigest(),
+            )
+        )
+
+    def _sniff(self, part: _Part) -> None:
+        part.sniffed = True
+
+        file_info = filetype.guess(bytes(part.content[: self.SNIFF_SIZE]))
+        if file_info is None or file_info.extension not in self.supported_types:
+            self._raise_invalid_type(part)
+
+    def _check_request_size(self, size: int) -> None:
+        if size > self.max_request_size:
+            raise EntityTooLargeError(
+                message=(
+                    "Request size must be less than "
+                    f"{FilterStorage.to_mb(self.max_request_size)} MB"
+                ),
+                reason="Upload request size exceeded",
+            )
+
+    @staticmethod
+    def _raise_invalid_type(part: _Part) -> NoReturn:
+        raise UnsupportedMediaTypeError(
+            message=f"File '{part.filename}' is not a valid image",
+            reason="Invalid file type",
+        )
@@ -0,0 +1,2 @@
+from .replica_health import replica_health_worker
+from .storage_deletion import storage_deletion_worker
@@ -0,0 +1,34 @@
+import asyncio
+
+from app.core import log, settings
+from app.db.base import replicas
+from app.db.routing import ReplicaSet
+
+
+class ReplicaHealthWorker:
+    """
+    Checks the read replicas periodically: unreachable replicas are taken out of
+    the rotation (their reads go to the others, or the primary), and put back once
+    they're reachable again.
+    """
+
+    def __init__(self, replicas: ReplicaSet, interval: float, timeout: float) -> None:
+        self.replicas = replicas
+        self.interval = interval
+        self.timeout = timeout
+
+    async def run(self) -> None:
+        """Check the replicas until cancelled"""
+
+        log.info("Replica health worker started (%s replicas)", len(self.replicas))
+
+        while True:
+            await self.replicas.check_health(self.timeout)
+            await asyncio.sleep(self.interval)
+
+
+replica_health_worker = ReplicaHealthWorker(
+    replicas,
+    interval=settings.db_replica_health_check_interval,
+    timeout=settings.db_replica_health_check_timeout,
+)
@@ -0,0 +1,111 @@
+import asyncio
+
+from app import crud, schemas
+from app.core import log, settings
+from app.db.base import AsyncDbSession
+from app.utils import filter_storage
+
+
+class StorageDeletionWorker:
+    """
+    Drains the storage deletions outbox: deletes the queued images from the storage
+    service in batches, and reschedules the failed batches with exponential backoff.
+
+    Batches are leased in a short transaction (claimed with `FOR UPDATE SKIP
+    LOCKED`), hence a worker can run in every app process without deleting the same
+    images twice, and no transaction (nor connection) is held while the storage
+    service is called. The outcome is recorded in another short transaction.
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        poll_interval: float,
+        lease: float,
+        retry_base_delay: float,
+        retry_max_delay: float,
+    ) -> None:
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+
+        self.deleted = 0
+        self.failed = 0
+
+    async def run(self) -> None:
+        """Drain the outbox until cancelled"""
+
+        log.info("Storage deletion worker started")
+
+        while True:
+            try:
+                processed = await self.drain_batch()
+            except Exception as e:
+                # E.g. the DB is unavailable, try again after a while
+                log.error("Storage deletion worker failed: %s", e)
+                processed = 0
+
+            # Keep going while there is a backlog, otherwise wait for new ones
+            if processed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def drain_batch(self) -> int:
+        """Handle a batch of due deletions, returns the number of deletions handled"""
+
+        async with AsyncDbSession() as db:
+            deletions = await crud.storage_deletion.claim_due(
+                db, self.batch_size, lease=self.lease
+            )
+            if len(deletions) == 0:
+                return 0
+
+            # An upload might have reused an image (same content) since it was queued
+            img_ids = await crud.style_filter.get_unreferenced_img_ids(
+                db, {deletion.img_id for deletion in deletions}
+            )
+
+            await db.commit()
+
+        ids = [deletion.id for deletion in deletions]
+        error: Exception | None = None
+
+        try:
+            await filter_storage.delete_many(img_ids)
+        except Exception as e:
+            log.error("Failed to delete %s images: %s", len(img_ids), e)
+            error = e
+
+        async with AsyncDbSession() as db:
+            if error is None:
+                await crud.storage_deletion.delete_many(db, ids)
+            else:
+                await crud.storage_deletion.retry_later(
+                    db,
+                    ids,
+                    base_delay=self.retry_base_delay,
+                    max_delay=self.retry_max_delay,
+                    error=str(error),
+                )
+
+            await db.commit()
+
+        if error is None:
+            self.deleted += len(img_ids)
+        else:
+            self.failed += len(ids)
+
+        return len(ids)
+
+    def metrics(self) -> schemas.StorageDeletionMetrics:
+        return schemas.StorageDeletionMetrics(deleted=self.deleted, failed=self.failed)
+
+
+storage_deletion_worker = StorageDeletionWorker(
+    batch_size=settings.storage_deletion_batch_size,
+    poll_interval=settings.storage_deletion_poll_interval,
+    lease=settings.storage_deletion_lease,
+    retry_base_delay=settings.storage_deletion_retry_base_delay,
+    retry_max_delay=settings.storage_deletion_retry_max_delay,
+)
@@ -0,0 +1,115 @@
+"""
+Benchmark of the main feed page cache: requests/sec of `GET /api/filter?limit=20`
+(anonymous, first page) with the cache disabled vs. enabled (in-process backend),
+and the number of feed queries run when `--concurrency` requests arrive at once
+right after the cache was invalidated (stampede), which should be collapsed into
+a single page query.
+
+Runs in-process against the DB of `.env` (uncached pages are read from its read
+replicas, if any, cached ones from the primary).
+
+Usage (from the backend directory):
+
+```bash
+python -m benchmarks.feed_cache --requests 2000 --concurrency 20
+```
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any
+
+import httpx
+from fastapi import status
+from sqlalchemy import event
+
+from app.main import app  # isort: split
+from app.crud.style_filter import FEED_TAG, feed_pages, feed_totals
+from app.db.base import engine, replicas
+
+URL = "/api/filter?limit=20"
+
+
+async def benchmark(
+    client: httpx.AsyncClient,
+    requests: int,
+    concurrency: int,
+) -> float:
+    """Returns requests/sec"""
+
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(URL)
+            assert response.status_code == status.HTTP_200_OK
+
+    # Warm up
+    for _ in range(50):
+        await client.get(URL)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+async def stampede(client: httpx.AsyncClient, concurrency: int) -> int:
+    """Returns the number of feed page queries run by concurrent requests"""
+
+    page_queries = 0
+
+    def after_cursor_execute(_conn: Any, _cursor: Any, statement: str, *_: Any) -> None:
+        nonlocal page_queries
+        page_queries += "ORDER BY style_filters.created_at" in statement
+
+    engines = [engine, *(replica.engine for replica in replicas.replicas)]
+    for db_engine in engines:
+        event.listen(
+            db_engine.sync_engine, "after_cursor_execute", after_cursor_execute
+        )
+
+    await feed_pages.invalidate({FEED_TAG})
+    responses = await asyncio.gather(*(client.get(URL) for _ in range(concurrency)))
+    assert all(response.status_code == status.HTTP_200_OK for response in responses)
+
+    for db_engine in engines:
+        event.remove(
+            db_engine.sync_engine, "after_cursor_execute", after_cursor_execute
+        )
+
+    return page_queries
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    feed_totals.clear()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        feed_pages.enabled = False
+        before = await benchmark(client, args.requests, args.concurrency)
+
+        feed_pages.enabled = True
+        after = await benchmark(client, args.requests, args.concurrency)
+
+        page_queries = await stampede(client, args.concurrency)
+
+    await engine.dispose()
+    await replicas.dispose()
+
+    print(f"Cache disabled:  {before:8.0f} req/s")
+    print(f"Cache enabled:   {after:8.0f} req/s")
+    print(f"Speedup:         {after / before:8.2f}x")
+    print(f"Stampede:        {args.concurrency} requests, {page_queries} page queries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
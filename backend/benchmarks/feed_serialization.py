@@ -0,0 +1,111 @@
+"""
+Benchmark of the feed response serialization: `GET /api/filter?limit=100` with the
+stdlib `json` based `JSONResponse` vs. the `orjson` based `JsonResponse` (the app's
+default response class).
+
+Reports the requests/sec of the whole endpoint (in-process, against the DB of
+`.env`, which must have at least `--limit` style filters) and the time to render
+the response body alone.
+
+Usage (from the backend directory):
+
+```bash
+python -m benchmarks.feed_serialization --requests 2000 --concurrency 10
+```
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import status
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute, request_response
+
+from app.main import app  # isort: split
+from app.core.responses import JsonResponse
+from app.db.base import engine
+
+
+def use_response_class(response_class: type[Response]) -> None:
+    """Re-create the route handlers, which capture the response class"""
+
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            route.response_class = response_class
+            route.app = request_response(route.get_route_handler())
+
+
+async def benchmark(
+    client: httpx.AsyncClient,
+    url: str,
+    requests: int,
+    concurrency: int,
+) -> float:
+    """Returns requests/sec"""
+
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        while not queue.empty():
+            queue.get_nowait()
+            response = await client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+
+    # Warm up
+    for _ in range(50):
+        await client.get(url)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+def render_time(response_class: type[Response], content: object, rounds: int) -> float:
+    """Returns microseconds per rendered response"""
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        response_class(content)
+    return (time.perf_counter() - start) / rounds * 1_000_000
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--limit", type=int, default=100)
+    args = parser.parse_args()
+
+    url = f"/api/filter?limit={args.limit}"
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        content = (await client.get(url)).json()
+        if len(content["filters"]) < args.limit:
+            raise SystemExit(f"At least {args.limit} style filters are needed")
+
+        use_response_class(JSONResponse)
+        before = await benchmark(client, url, args.requests, args.concurrency)
+
+        use_response_class(JsonResponse)
+        after = await benchmark(client, url, args.requests, args.concurrency)
+
+    await engine.dispose()
+
+    before_render = render_time(JSONResponse, content, 2000)
+    after_render = render_time(JsonResponse, content, 2000)
+
+    print(f"JSONResponse (json):   {before:8.0f} req/s {before_render:8.1f} us/render")
+    print(f"JsonResponse (orjson): {after:8.0f} req/s {after_render:8.1f} us/render")
+    print(
+        f"Speedup:               {after / before:8.2f}x "
+        f"{before_render / after_render:8.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,110 @@
+"""
+Microbenchmark of the response headers middleware: requests/sec of an app with
+the previous `@app.middleware("http")` functions (`BaseHTTPMiddleware`) vs. the
+pure ASGI `ResponseHeadersMiddleware`, both behind the same middlewares as the
+real app (correlation id, CORS and GZip).
+
+Requests are sent in-process (no network), so the difference is only the
+middleware overhead.
+
+Usage (from the backend directory):
+
+```bash
+python -m benchmarks.middleware --requests 20000 --concurrency 50
+```
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import httpx
+from asgi_correlation_id import CorrelationIdMiddleware
+from fastapi import FastAPI, Request, Response
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+
+from app.core.middleware import ResponseHeadersMiddleware
+from app.utils.enums import HttpHeader
+
+CallNext = Callable[[Request], Awaitable[Response]]
+
+
+def create_app(pure_asgi: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/")
+    async def index() -> dict[str, str]:
+        return {"message": "Hello from Picasso"}
+
+    app.add_middleware(CorrelationIdMiddleware, header_name=HttpHeader.REQUEST_ID.value)
+    app.add_middleware(CORSMiddleware, allow_origins=["http://localhost:3000"])
+    app.add_middleware(GZipMiddleware, minimum_size=500)
+
+    if pure_asgi:
+        app.add_middleware(ResponseHeadersMiddleware)
+        return app
+
+    # Middlewares as they were before `ResponseHeadersMiddleware`
+
+    @app.middleware("http")
+    async def add_security_headers(req: Request, call_next: CallNext) -> Response:
+        response = await call_next(req)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        return response
+
+    @app.middleware("http")
+    async def add_process_time_header(req: Request, call_next: CallNext) -> Response:
+        start_time = time.time()
+        response = await call_next(req)
+        process_time = time.time() - start_time
+        response.headers[HttpHeader.PROCESS_TIME.value] = str(process_time)
+        return response
+
+    return app
+
+
+async def benchmark(app: FastAPI, requests: int, concurrency: int) -> float:
+    """Returns requests/sec"""
+
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+    queue: asyncio.Queue[int] = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def worker() -> None:
+            while not queue.empty():
+                queue.get_nowait()
+                response = await client.get("/")
+                assert HttpHeader.PROCESS_TIME.value in response.headers
+
+        # Warm up
+        for _ in range(100):
+            await client.get("/")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return requests / (time.perf_counter() - start)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    before = await benchmark(create_app(False), args.requests, args.concurrency)
+    after = await benchmark(create_app(True), args.requests, args.concurrency)
+
+    print(f"BaseHTTPMiddleware:        {before:10.0f} req/s")
+    print(f"ResponseHeadersMiddleware: {after:10.0f} req/s")
+    print(f"Speedup:                   {after / before:10.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+"""
+Load test of feed reads during concurrent uploads: `--uploads` upload requests are
+sent at once to a storage backend that takes `--storage-latency` seconds per image
+(like a remote storage service), while `--readers` clients keep reading the feed
+(`GET /api/filter?limit=20`). Reports the feed latency percentiles and the number
+of DB connections checked out (sampled after every feed read).
+
+Uploads mustn't hold a DB connection while the images are being stored, otherwise
+enough slow uploads exhaust the connection pool and the feed reads wait for them.
+
+Runs in-process against the DB of `.env`. A temporary user is created (and deleted
+along with its style filters afterwards) and the images are stored in a temporary
+directory.
+
+Usage (from the backend directory):
+
+```bash
+python -m benchmarks.upload_load --uploads 40 --storage-latency 2 --readers 5
+```
+"""
+
+import argparse
+import asyncio
+import io
+import statistics
+import tempfile
+import time
+from typing import BinaryIO
+
+import httpx
+from fastapi import status
+from PIL import Image
+from sqlalchemy import delete, insert
+
+from app.main import app  # isort: split
+from app import utils
+from app.db.base import engine
+from app.db.models import StyleFilter, User
+from app.utils import filter_storage
+from app.utils.image_derivatives import DerivativePipeline
+from app.utils.storage_backends import LocalStorageBackend, StoredImage
+
+
+class SlowStorageBackend(LocalStorageBackend):
+    """Local storage with the latency of a remote storage service"""
+
+    def __init__(self, root: str, latency: float) -> None:
+        super().__init__(
+            root=root,
+            base_url="http://localhost:8000/static/style-filters",
+            derivatives=DerivativePipeline(max_workers=1),
+        )
+        self.latency = latency
+
+    def upload(self, file: BinaryIO, content_type: str | None) -> StoredImage:
+        time.sleep(self.latency)
+        return super().upload(file, content_type)
+
+
+def make_png(seed: int) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 24), (seed % 256, seed // 256 % 256, 64)).save(
+        buffer, format="PNG"
+    )
+    return buffer.getvalue()
+
+
+async def create_user() -> tuple[int, str]:
+    async with engine.begin() as conn:
+        result = await conn.execute(
+            insert(User)
+            .values(
+                username=f"load-test-{utils.auth.generate_token(8)}",
+                email="load-test@example.com",
+                profile_pic_url="http://localhost:8000/static/images/load-test.jpg",
+            )
+            .returning(User.id, User.public_user_id)
+        )
+        user_id, public_user_id = result.one()
+
+    return user_id, utils.auth.create_access_token({"sub": str(public_user_id)})
+
+
+async def delete_user(user_id: int) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(delete(StyleFilter).where(StyleFilter.author_id == user_id))
+        await conn.execute(delete(User).where(User.id == user_id))
+
+
+def percentile(values: list[float], q: int) -> float:
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else 0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=40)
+    parser.add_argument("--storage-latency", type=float, default=2.0)
+    parser.add_argument("--readers", type=int, default=5)
+    args = parser.parse_args()
+
+    user_id, access_token = await create_user()
+    transport = httpx.ASGITransport(app=app)  # type: ignore[arg-type]
+
+    feed_latencies: list[float] = []
+    checked_out: list[int] = []
+    uploads_done = asyncio.Event()
+
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url="http://test",
+        timeout=None,
+    ) as client:
+
+        async def upload(i: int) -> int:
+            response = await client.post(
+                "/api/filter",
+                files=[("files", (f"{i}.png", make_png(i), "image/png"))],
+                headers={"Authorization": f"Bearer {access_token}"},
+            )
+            return response.status_code
+
+        async def read_feed() -> None:
+            while not uploads_done.is_set():
+                start = time.perf_counter()
+                response = await client.get("/api/filter", params={"limit": 20})
+                feed_latencies.append(time.perf_counter() - start)
+
+                assert response.status_code == status.HTTP_200_OK
+                checked_out.append(engine.pool.checkedout())
+
+        with tempfile.TemporaryDirectory() as root:
+            filter_storage.backend = SlowStorageBackend(root, args.storage_latency)
+
+            readers = [asyncio.create_task(read_feed()) for _ in range(args.readers)]
+
+            start = time.perf_counter()
+            statuses = await asyncio.gather(*(upload(i) for i in range(args.uploads)))
+            elapsed = time.perf_counter() - start
+
+            uploads_done.set()
+            await asyncio.gather(*readers)
+
+    await delete_user(user_id)
+    await engine.dispose()
+
+    failed = sum(code != status.HTTP_201_CREATED for code in statuses)
+    print(f"Uploads:       {args.uploads} in {elapsed:.1f}s, {failed} failed")
+    print(f"Feed reads:    {len(feed_latencies)}")
+    print(f"Feed p50:      {percentile(feed_latencies, 50) * 1000:8.1f} ms")
+    print(f"Feed p95:      {percentile(feed_latencies, 95) * 1000:8.1f} ms")
+    print(f"Feed max:      {max(feed_latencies) * 1000:8.1f} ms")
+    print(f"Checked out:   {statistics.mean(checked_out):8.1f} connections (mean)")
+    print(f"Checked out:   {max(checked_out):8d} connections (max)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())